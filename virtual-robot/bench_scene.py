@@ -0,0 +1,99 @@
+"""
+场景规模基准测试
+测量不同物体数量下的场景加载时间和单步物理仿真耗时，对比逐个创建与批量去重创建
+"""
+import argparse
+import time
+
+import numpy as np
+import pybullet as p
+import pybullet_data
+
+from scene_loader import SceneLoader
+
+
+COLORS = [[1, 0, 0, 1], [0, 1, 0, 1], [0, 0, 1, 1], [1, 1, 0, 1]]
+
+
+def make_scene(count, static_ratio=0.5, seed=0):
+    """
+    生成包含 count 个立方体的随机场景描述
+
+    Args:
+        count: 物体数量
+        static_ratio: 静态物体比例
+        seed: 随机种子
+    """
+    rng = np.random.default_rng(seed)
+    grid = int(np.ceil(np.sqrt(count)))
+    objects = []
+    for i in range(count):
+        x, y = divmod(i, grid)
+        objects.append({
+            'shape': 'box',
+            'size': [0.2, 0.2, 0.2],
+            'color': COLORS[i % len(COLORS)],
+            'static': bool(rng.random() < static_ratio),
+            'sleep': True,
+            'position': [x * 0.6 - grid * 0.3, y * 0.6 - grid * 0.3, 0.2],
+        })
+    return {'objects': objects}
+
+
+def load_naive(scene):
+    """原 _setup_scene 的方式：每个物体单独创建碰撞形状、视觉形状和刚体"""
+    for obj in scene['objects']:
+        collision = p.createCollisionShape(p.GEOM_BOX, halfExtents=obj['size'])
+        visual = p.createVisualShape(p.GEOM_BOX, halfExtents=obj['size'], rgbaColor=obj['color'])
+        p.createMultiBody(
+            baseMass=0.0 if obj['static'] else 1.0,
+            baseCollisionShapeIndex=collision,
+            baseVisualShapeIndex=visual,
+            basePosition=obj['position']
+        )
+
+
+def measure(scene, loader, steps):
+    """在新的物理世界中加载场景，返回 (加载耗时 ms, 平均单步耗时 ms)"""
+    client = p.connect(p.DIRECT)
+    try:
+        p.setAdditionalSearchPath(pybullet_data.getDataPath())
+        p.setGravity(0, 0, -9.8)
+        p.loadURDF("plane.urdf")
+
+        start = time.perf_counter()
+        loader(scene)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # 先让物体落稳，再测稳态步进耗时
+        for _ in range(60):
+            p.stepSimulation()
+        start = time.perf_counter()
+        for _ in range(steps):
+            p.stepSimulation()
+        step_ms = (time.perf_counter() - start) * 1000 / steps
+        return load_ms, step_ms
+    finally:
+        p.disconnect(client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='场景加载与仿真步进基准测试')
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 100, 1000, 5000],
+                        help='测试的物体数量（默认: 10 100 1000 5000）')
+    parser.add_argument('--steps', type=int, default=240, help='每个规模测量的仿真步数（默认: 240）')
+    parser.add_argument('--static-ratio', type=float, default=0.5, help='静态物体比例（默认: 0.5）')
+    args = parser.parse_args()
+
+    print(f"{'objects':>8} | {'naive load':>11} | {'batch load':>11} | {'naive step':>11} | {'batch step':>11}")
+    print('-' * 66)
+    for count in args.counts:
+        scene = make_scene(count, static_ratio=args.static_ratio)
+        naive_load, naive_step = measure(scene, load_naive, args.steps)
+        batch_load, batch_step = measure(scene, lambda s: SceneLoader().load(s), args.steps)
+        print(f"{count:>8} | {naive_load:>9.1f}ms | {batch_load:>9.1f}ms | "
+              f"{naive_step:>9.3f}ms | {batch_step:>9.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
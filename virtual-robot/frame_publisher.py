@@ -0,0 +1,340 @@
+"""
+共享内存帧发布模块
+将 SBS 画面（可选深度）和机器人位姿/关节状态写入 multiprocessing.shared_memory 环形缓冲区，
+供感知、日志、ROS 桥接等进程零拷贝读取，不增加渲染和编码开销
+"""
+import os
+import struct
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+
+# 共享内存布局
+#
+#   [全局头 HEADER_SIZE 字节]
+#       magic, version, slot_count, height, width, has_depth, max_joints, owner_pid, latest_seq
+#   [槽 0][槽 1]...[槽 slot_count-1]
+#
+# 每个槽：
+#   seq_begin(uint64) seq_end(uint64) timestamp(float64)
+#   position[3] orientation[4] num_joints joints[max_joints] (均为 float64)
+#   image (uint8, height x width x 3)
+#   depth (float32, height x width，可选)
+#
+# 写入顺序：seq_begin → 数据 → seq_end → latest_seq（seqlock）
+# 读取时 seq_end == seq 且读完后 seq_begin 仍等于 seq，说明数据完整未被覆盖
+# 写端关闭或重建（resize）前把 latest_seq 置为 RETIRED_SEQ，已挂载的读端据此得知需要重新挂载
+
+MAGIC = b'VRFR'
+VERSION = 1
+HEADER_FORMAT = '<4sIIIIIIIQ'
+HEADER_SIZE = 64
+LATEST_SEQ_OFFSET = struct.calcsize('<4sIIIIIII')
+RETIRED_SEQ = 0xFFFFFFFFFFFFFFFF
+SLOT_META_FIELDS = 3 + 7 + 1  # seq_begin, seq_end, timestamp, pose, num_joints
+
+
+def _slot_layout(height, width, has_depth, max_joints):
+    """计算单个槽内各字段的偏移和槽大小"""
+    meta_size = (SLOT_META_FIELDS + max_joints) * 8
+    image_offset = meta_size
+    image_size = height * width * 3
+    depth_offset = image_offset + image_size
+    # 深度缓冲按 4 字节对齐
+    depth_offset += (-depth_offset) % 4
+    depth_size = height * width * 4 if has_depth else 0
+    slot_size = depth_offset + depth_size
+    # 槽按 64 字节对齐，避免相邻槽共享缓存行
+    slot_size += (-slot_size) % 64
+    return image_offset, depth_offset, slot_size
+
+
+class FrameBufferRetired(Exception):
+    """写端已关闭或重建了共享内存，读端需要重新创建 FrameReader"""
+
+
+def _pid_alive(pid):
+    """检查写端进程是否仍在运行（pid 为 0 表示未知，视为已退出）"""
+    if os.name == 'nt':
+        # Windows 的命名共享内存随最后一个句柄关闭而释放，能打开即说明仍有进程在使用；
+        # 且 os.kill 在 Windows 上会直接结束目标进程
+        return True
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # 进程存在但属于其他用户
+        return True
+    return True
+
+
+class _RingBuffer:
+    """写端和读端共用的共享内存视图"""
+
+    def _map(self, shm, slot_count, height, width, has_depth, max_joints):
+        self.shm = shm
+        self.slot_count = slot_count
+        self.height = height
+        self.width = width
+        self.has_depth = has_depth
+        self.max_joints = max_joints
+
+        image_offset, depth_offset, slot_size = _slot_layout(height, width, has_depth, max_joints)
+        buf = shm.buf
+        self._latest = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=LATEST_SEQ_OFFSET)
+
+        self._seq_begin = []
+        self._seq_end = []
+        self._meta = []
+        self._images = []
+        self._depths = []
+        for i in range(slot_count):
+            base = HEADER_SIZE + i * slot_size
+            counters = np.ndarray((2,), dtype=np.uint64, buffer=buf, offset=base)
+            self._seq_begin.append(counters[0:1])
+            self._seq_end.append(counters[1:2])
+            self._meta.append(np.ndarray((SLOT_META_FIELDS - 2 + max_joints,), dtype=np.float64,
+                                         buffer=buf, offset=base + 16))
+            self._images.append(np.ndarray((height, width, 3), dtype=np.uint8,
+                                           buffer=buf, offset=base + image_offset))
+            self._depths.append(np.ndarray((height, width), dtype=np.float32,
+                                           buffer=buf, offset=base + depth_offset)
+                                if has_depth else None)
+
+    @property
+    def latest_seq(self):
+        """最新一条完整写入的序号（0 表示尚无数据，RETIRED_SEQ 表示已停用）"""
+        return int(self._latest[0])
+
+    @property
+    def retired(self):
+        """写端是否已停用该共享内存（关闭或因尺寸变化而重建）"""
+        return self.latest_seq == RETIRED_SEQ
+
+    def _release(self):
+        # 先释放所有 numpy 视图，否则 SharedMemory.close() 会因导出缓冲区仍被引用而失败
+        self._latest = None
+        self._seq_begin = self._seq_end = self._meta = self._images = self._depths = []
+        self.shm.close()
+
+
+class FramePublisher(_RingBuffer):
+    """
+    共享内存帧发布者（写端）
+    覆盖最旧的槽，不等待读端
+    """
+
+    def __init__(self, name, width, height, max_joints=32, slots=4, with_depth=False, replace=False):
+        """
+        Args:
+            name: 共享内存名称，读端用同一名称挂载
+            width: SBS 图像宽度（双眼总宽度）
+            height: 图像高度
+            max_joints: 每条记录最多保存的关节数
+            slots: 环形缓冲区槽数
+            with_depth: 是否同时发布深度图
+            replace: 同名共享内存仍被其他进程使用（或不是帧缓冲区）时是否强制替换
+
+        Raises:
+            FileExistsError: 同名共享内存正在被使用且 replace=False
+        """
+        self.name = name
+        self.replace = replace
+        self._create(width, height, max_joints, slots, with_depth)
+
+    def _create(self, width, height, max_joints, slots, with_depth):
+        """创建共享内存并写入全局头"""
+        name = self.name
+        _, _, slot_size = _slot_layout(height, width, with_depth, max_joints)
+        size = HEADER_SIZE + slots * slot_size
+
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._remove_existing()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        struct.pack_into(HEADER_FORMAT, shm.buf, 0, MAGIC, VERSION, slots, height, width,
+                         int(with_depth), max_joints, os.getpid(), 0)
+        self._map(shm, slots, height, width, with_depth, max_joints)
+        self.seq = 0
+
+    def _remove_existing(self):
+        """
+        删除同名的残留共享内存
+
+        只有本格式且写端进程已退出（上次异常退出残留）时才自动删除；
+        写端仍在运行或不是帧缓冲区时，除非 replace=True，否则拒绝覆盖
+        """
+        existing = shared_memory.SharedMemory(name=self.name)
+        try:
+            if existing.size >= HEADER_SIZE:
+                magic, version, *_, owner_pid, _ = struct.unpack_from(HEADER_FORMAT, existing.buf, 0)
+            else:
+                magic, version, owner_pid = None, None, 0
+
+            if not self.replace:
+                if magic != MAGIC or version != VERSION:
+                    raise FileExistsError(
+                        f"Shared memory '{self.name}' exists and is not a frame ring buffer; "
+                        f"choose another name or pass replace=True")
+                if _pid_alive(owner_pid):
+                    raise FileExistsError(
+                        f"Shared memory '{self.name}' is in use by process {owner_pid}; "
+                        f"choose another name or pass replace=True")
+        except FileExistsError:
+            # 不属于本进程，避免退出时被 resource_tracker 删除
+            existing.close()
+            resource_tracker.unregister(existing._name, 'shared_memory')
+            raise
+
+        print(f"⚠️  Replacing existing shared memory '{self.name}'")
+        if magic == MAGIC:
+            # 通知仍挂载着旧共享内存的读端
+            struct.pack_into('<Q', existing.buf, LATEST_SEQ_OFFSET, RETIRED_SEQ)
+        existing.close()
+        existing.unlink()
+
+    def publish(self, image, position, orientation, joint_positions=(), depth=None, timestamp=None):
+        """
+        写入一帧
+
+        Args:
+            image: SBS 图像 (height, width, 3) uint8
+            position: 头部位置 [x, y, z]
+            orientation: 头部朝向四元数 [x, y, z, w]
+            joint_positions: 关节角度列表
+            depth: 深度图 (height, width) float32，仅在 with_depth=True 时写入
+            timestamp: 时间戳，默认 time.time()
+
+        Returns:
+            int: 本帧序号
+        """
+        seq = self.seq + 1
+        idx = seq % self.slot_count
+        n = min(len(joint_positions), self.max_joints)
+
+        self._seq_begin[idx][0] = seq
+
+        meta = self._meta[idx]
+        meta[0] = time.time() if timestamp is None else timestamp
+        meta[1:4] = position
+        meta[4:8] = orientation
+        meta[8] = n
+        if n:
+            meta[9:9 + n] = joint_positions[:n]
+
+        self._images[idx][...] = image
+        if self.has_depth and depth is not None:
+            self._depths[idx][...] = depth
+
+        self._seq_end[idx][0] = seq
+        self._latest[0] = seq
+        self.seq = seq
+        return seq
+
+    def resize(self, width, height):
+        """
+        按新的图像尺寸重建共享内存（序号从头开始）
+
+        旧的共享内存被标记为停用，已挂载的读端在下一次 read() 时收到 FrameBufferRetired，
+        需要重新创建 FrameReader。
+        """
+        if (width, height) == (self.width, self.height):
+            return
+        max_joints, slots, with_depth = self.max_joints, self.slot_count, self.has_depth
+        self.close()
+        self._create(width, height, max_joints, slots, with_depth)
+
+    def close(self):
+        """标记为停用，关闭并删除共享内存"""
+        shm = self.shm
+        self._latest[0] = RETIRED_SEQ
+        self._release()
+        shm.unlink()
+
+
+class FrameReader(_RingBuffer):
+    """
+    共享内存帧读取者（读端）
+    无锁读取；写端追上时返回 None 而不是撕裂的数据
+    """
+
+    def __init__(self, name):
+        """
+        Args:
+            name: FramePublisher 使用的共享内存名称
+        """
+        self.name = name
+        shm = shared_memory.SharedMemory(name=name)
+        # 读端不拥有共享内存，避免退出时被 resource_tracker 删除
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+        magic, version, slots, height, width, has_depth, max_joints, _, _ = struct.unpack_from(
+            HEADER_FORMAT, shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            shm.close()
+            raise ValueError(f"Shared memory '{name}' is not a frame ring buffer")
+
+        self._map(shm, slots, height, width, bool(has_depth), max_joints)
+
+    def read(self, seq=None, copy=True):
+        """
+        读取一帧
+
+        Args:
+            seq: 要读取的序号，默认最新一帧
+            copy: False 时图像和深度为共享内存视图（零拷贝），
+                  使用完后需调用 is_valid(seq) 确认期间未被覆盖
+
+        Returns:
+            dict 或 None: {'seq', 'timestamp', 'position', 'orientation', 'joints', 'image', 'depth'}，
+                          该序号尚未写入或已被覆盖时返回 None
+
+        Raises:
+            FrameBufferRetired: 写端已关闭或重建了共享内存，需要重新创建 FrameReader
+        """
+        if self.retired:
+            raise FrameBufferRetired(f"Shared memory '{self.name}' was retired by the writer; reattach")
+        if seq is None:
+            seq = self.latest_seq
+        if seq <= 0:
+            return None
+
+        idx = seq % self.slot_count
+        if int(self._seq_end[idx][0]) != seq:
+            return None
+
+        meta = self._meta[idx].copy()
+        image = self._images[idx]
+        depth = self._depths[idx]
+        if copy:
+            image = image.copy()
+            depth = depth.copy() if depth is not None else None
+
+        if not self.is_valid(seq):
+            return None
+
+        n = int(meta[8])
+        return {
+            'seq': seq,
+            'timestamp': float(meta[0]),
+            'position': meta[1:4],
+            'orientation': meta[4:8],
+            'joints': meta[9:9 + n],
+            'image': image,
+            'depth': depth,
+        }
+
+    def is_valid(self, seq):
+        """检查序号为 seq 的槽是否仍未被写端覆盖"""
+        return int(self._seq_begin[seq % self.slot_count][0]) == seq
+
+    def close(self):
+        """断开共享内存（不删除）"""
+        self._release()
@@ -0,0 +1,313 @@
+"""
+无头压力测试客户端
+模拟多个 VR 头显连接 SignalingServer / WebRTCServer：建立 WebSocket 信令和 aiortc 对等连接，
+按设定频率通过 DataChannel 发送合成控制数据，接收并解码视频，统计每个会话的帧率、帧间隔抖动、
+首帧时间以及服务器 CPU 占用
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import ssl
+import statistics
+import time
+
+import websockets
+from aiortc import RTCPeerConnection, RTCSessionDescription
+from aiortc.mediastreams import MediaStreamError
+
+from network_shim import LinkProfile, NetworkShim
+
+
+class SessionStats:
+    """单个会话的统计数据"""
+
+    def __init__(self, index):
+        self.index = index
+        self.started = 0.0
+        self.first_frame_time = None
+        self.frame_times = []
+        self.frame_size = None
+        self.controls_sent = 0
+        self.error = None
+        self.link = None
+
+    def summary(self):
+        """
+        Returns:
+            dict: fps、平均帧间隔、抖动（帧间隔标准差）、首帧时间（毫秒）
+        """
+        result = {
+            'session': self.index,
+            'frames': len(self.frame_times),
+            'fps': 0.0,
+            'interval_ms': 0.0,
+            'jitter_ms': 0.0,
+            'ttff_ms': None,
+            'controls': self.controls_sent,
+            'size': self.frame_size,
+            'error': self.error,
+            'link': self.link,
+        }
+        if self.first_frame_time is not None:
+            result['ttff_ms'] = (self.first_frame_time - self.started) * 1000
+        if len(self.frame_times) >= 2:
+            intervals = [b - a for a, b in zip(self.frame_times, self.frame_times[1:])]
+            span = self.frame_times[-1] - self.frame_times[0]
+            result['fps'] = len(intervals) / span if span > 0 else 0.0
+            result['interval_ms'] = statistics.mean(intervals) * 1000
+            result['jitter_ms'] = statistics.pstdev(intervals) * 1000
+        return result
+
+
+def synthetic_control(t, index):
+    """
+    生成与 VR 客户端格式一致的合成控制数据（头部缓慢左右转动）
+
+    Args:
+        t: 会话开始后的秒数
+        index: 会话编号（用于错开相位）
+    """
+    yaw = 0.5 * math.sin(t + index)
+    return {
+        'timestamp': t * 1000,
+        'headset': {
+            'position': {'x': 0.0, 'y': 1.6, 'z': 0.0},
+            'rotation': {'x': 0.0, 'y': math.sin(yaw / 2), 'z': 0.0, 'w': math.cos(yaw / 2)},
+        },
+        'controllers': [
+            {
+                'hand': hand,
+                'position': {'x': side * 0.2, 'y': 1.2, 'z': -0.3},
+                'rotation': {'x': 0.0, 'y': 0.0, 'z': 0.0, 'w': 1.0},
+                'buttons': {'trigger': 0, 'grip': 0, 'thumbstick': {'x': 0, 'y': 0}},
+            }
+            for hand, side in (('left', -1), ('right', 1))
+        ],
+    }
+
+
+async def consume_track(track, stats):
+    """接收并解码视频帧，记录到达时间"""
+    while True:
+        try:
+            frame = await track.recv()
+        except MediaStreamError:
+            return
+        now = time.perf_counter()
+        if stats.first_frame_time is None:
+            stats.first_frame_time = now
+            stats.frame_size = f'{frame.width}x{frame.height}'
+        stats.frame_times.append(now)
+
+
+async def run_session(index, url, ssl_context, duration, control_rate, tracks, link=None):
+    """
+    运行单个模拟头显会话
+
+    Args:
+        index: 会话编号
+        url: 信令服务器地址
+        ssl_context: WSS 使用的 SSL 上下文（WS 时为 None）
+        duration: 会话持续时间（秒）
+        control_rate: 控制数据发送频率（Hz），0 表示不发送
+        tracks: 请求的视频轨道数（sbs 为 1，dual 为 2）
+        link: 弱网参数 LinkProfile（双向相同），None 表示不模拟
+    """
+    stats = SessionStats(index)
+    stats.started = time.perf_counter()
+    pc = RTCPeerConnection()
+    consumers = []
+
+    @pc.on('track')
+    def on_track(track):
+        if track.kind == 'video':
+            consumers.append(asyncio.ensure_future(consume_track(track, stats)))
+
+    channel = pc.createDataChannel('control')
+    for _ in range(tracks):
+        pc.addTransceiver('video', direction='recvonly')
+
+    shim = None
+    if link is not None:
+        shim = NetworkShim(uplink=link, downlink=link, seed=index)
+        shim.attach(pc)
+
+    try:
+        # aiortc 在 setLocalDescription 中完成 ICE 收集，offer 中已包含候选地址
+        await pc.setLocalDescription(await pc.createOffer())
+        async with websockets.connect(url, ssl=ssl_context) as ws:
+            await ws.send(json.dumps({'type': 'offer', 'sdp': pc.localDescription.sdp}))
+            while True:
+                answer = json.loads(await ws.recv())
+                if answer.get('type') == 'answer':
+                    break
+            await pc.setRemoteDescription(RTCSessionDescription(sdp=answer['sdp'], type=answer['type']))
+
+            # 发送控制数据直到会话结束
+            deadline = stats.started + duration
+            period = 1.0 / control_rate if control_rate > 0 else None
+            while time.perf_counter() < deadline:
+                if period and channel.readyState == 'open':
+                    channel.send(json.dumps(synthetic_control(time.perf_counter() - stats.started, index)))
+                    stats.controls_sent += 1
+                await asyncio.sleep(period or 0.1)
+    except Exception as e:
+        stats.error = repr(e)
+    finally:
+        for task in consumers:
+            task.cancel()
+        await pc.close()
+        if shim:
+            stats.link = shim.get_stats()
+    return stats
+
+
+class CpuSampler:
+    """服务器进程 CPU 占用采样（优先使用 psutil，否则读取 /proc）"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.samples = []
+        self._proc = None
+        try:
+            import psutil
+            self._proc = psutil.Process(pid)
+            self._proc.cpu_percent(None)
+        except ImportError:
+            if not os.path.exists(f'/proc/{pid}/stat'):
+                raise RuntimeError("Server CPU sampling requires psutil or /proc")
+            self._last = self._proc_times()
+
+    def _proc_times(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        return (int(fields[11]) + int(fields[12])) / ticks, time.perf_counter()
+
+    def sample(self):
+        """记录自上次采样以来的 CPU 占用（百分比，多核可超过 100）"""
+        if self._proc is not None:
+            self.samples.append(self._proc.cpu_percent(None))
+            return
+        cpu, wall = self._proc_times()
+        last_cpu, last_wall = self._last
+        self._last = (cpu, wall)
+        if wall > last_wall:
+            self.samples.append((cpu - last_cpu) / (wall - last_wall) * 100)
+
+    async def run(self, interval=1.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.sample()
+
+
+async def main(url, sessions, duration, control_rate, ramp, tracks, insecure, server_pid, link=None):
+    """
+    启动所有会话并打印统计结果
+
+    Args:
+        url: 信令服务器地址
+        sessions: 并发会话数
+        duration: 每个会话持续时间（秒）
+        control_rate: 控制数据发送频率（Hz）
+        ramp: 相邻会话的启动间隔（秒）
+        tracks: 每个会话的视频轨道数
+        insecure: WSS 时是否跳过证书校验（自签名证书）
+        server_pid: 服务器进程 PID，用于采样 CPU 占用
+        link: 弱网参数 LinkProfile，None 表示不模拟
+    """
+    ssl_context = None
+    if url.startswith('wss://'):
+        ssl_context = ssl.create_default_context()
+        if insecure:
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+
+    print(f"🚀 Load test: {sessions} sessions x {duration}s against {url}")
+    print(f"   control {control_rate}Hz, {tracks} video track(s), ramp {ramp}s")
+    if link is not None:
+        bandwidth = f"{link.bandwidth / 1000:.0f}kbps" if link.bandwidth else 'unlimited'
+        print(f"   link: loss {link.loss * 100:.1f}%, delay {link.delay * 1000:.0f}ms, "
+              f"jitter {link.jitter * 1000:.0f}ms, bandwidth {bandwidth}")
+    print()
+
+    sampler = CpuSampler(server_pid) if server_pid else None
+    sampler_task = asyncio.ensure_future(sampler.run()) if sampler else None
+
+    async def delayed(i):
+        await asyncio.sleep(i * ramp)
+        return await run_session(i, url, ssl_context, duration, control_rate, tracks, link)
+
+    results = await asyncio.gather(*(delayed(i) for i in range(sessions)))
+    if sampler_task:
+        sampler_task.cancel()
+
+    summaries = [r.summary() for r in results]
+    print(f"{'session':>7} | {'frames':>6} | {'fps':>6} | {'interval':>9} | {'jitter':>8} | {'ttff':>8} | size")
+    print('-' * 72)
+    for s in summaries:
+        ttff = f"{s['ttff_ms']:.0f}ms" if s['ttff_ms'] is not None else '-'
+        print(f"{s['session']:>7} | {s['frames']:>6} | {s['fps']:>6.1f} | {s['interval_ms']:>7.1f}ms | "
+              f"{s['jitter_ms']:>6.1f}ms | {ttff:>8} | {s['size'] or '-'}")
+        if s['error']:
+            print(f"          error: {s['error']}")
+
+    ok = [s for s in summaries if s['frames'] >= 2]
+    print()
+    if ok:
+        print(f"Sessions with video: {len(ok)}/{len(summaries)}, "
+              f"mean fps {statistics.mean(s['fps'] for s in ok):.1f}, "
+              f"min fps {min(s['fps'] for s in ok):.1f}, "
+              f"mean jitter {statistics.mean(s['jitter_ms'] for s in ok):.1f}ms")
+    else:
+        print(f"Sessions with video: 0/{len(summaries)}")
+    links = [s['link'] for s in summaries if s['link']]
+    if links:
+        for direction in ('uplink', 'downlink'):
+            packets = sum(l[direction]['packets'] for l in links)
+            lost = sum(l[direction]['lost'] + l[direction]['queue_dropped'] for l in links)
+            print(f"Emulated {direction}: {packets} packets, {lost} dropped "
+                  f"({lost / packets * 100 if packets else 0:.1f}%)")
+    if sampler and sampler.samples:
+        print(f"Server CPU: mean {statistics.mean(sampler.samples):.0f}%, max {max(sampler.samples):.0f}%")
+    return summaries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='模拟多个 VR 头显的压力测试客户端')
+    parser.add_argument('--url', type=str, default='wss://localhost:8080', help='信令服务器地址（默认: wss://localhost:8080）')
+    parser.add_argument('--sessions', type=int, default=4, help='并发会话数（默认: 4）')
+    parser.add_argument('--duration', type=float, default=20, help='每个会话持续时间，秒（默认: 20）')
+    parser.add_argument('--control-rate', type=float, default=72, help='控制数据发送频率，Hz（默认: 72）')
+    parser.add_argument('--ramp', type=float, default=0.5, help='相邻会话启动间隔，秒（默认: 0.5）')
+    parser.add_argument('--video-mode', type=str, default='sbs', choices=['sbs', 'dual'],
+                        help='与服务器一致的视频模式，决定请求的轨道数（默认: sbs）')
+    parser.add_argument('--insecure', action='store_true', help='WSS 时跳过证书校验（自签名证书）')
+    parser.add_argument('--server-pid', type=int, default=None, help='服务器进程 PID，用于采样 CPU 占用')
+    parser.add_argument('--loss', type=float, default=0, help='模拟丢包率，百分比（默认: 0）')
+    parser.add_argument('--delay', type=float, default=0, help='模拟单向延迟，毫秒（默认: 0）')
+    parser.add_argument('--jitter', type=float, default=0, help='模拟延迟抖动，毫秒（默认: 0）')
+    parser.add_argument('--bandwidth', type=float, default=0, help='模拟带宽上限，kbps（默认: 0，不限）')
+
+    args = parser.parse_args()
+
+    link = LinkProfile(
+        loss=args.loss / 100,
+        delay=args.delay / 1000,
+        jitter=args.jitter / 1000,
+        bandwidth=args.bandwidth * 1000 or None
+    )
+
+    asyncio.run(main(
+        url=args.url,
+        sessions=args.sessions,
+        duration=args.duration,
+        control_rate=args.control_rate,
+        ramp=args.ramp,
+        tracks=1 if args.video_mode == 'sbs' else 2,
+        insecure=args.insecure,
+        server_pid=args.server_pid,
+        link=None if link.is_ideal else link
+    ))
@@ -0,0 +1,160 @@
+"""
+事件循环卡顿监测模块
+持续采样 asyncio 事件循环延迟，定位阻塞事件循环的回调
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+
+# 当前正在事件循环线程中执行的阶段名称（由 stage() 设置）
+_current_stage = 'idle'
+_stage_started = 0.0
+
+
+@contextmanager
+def stage(name):
+    """
+    标记一段在事件循环中执行的代码所属的阶段
+
+    开销仅为两次全局变量赋值，可以长期保留在热路径上。
+
+    Args:
+        name: 阶段名称，如 'render'、'physics'、'signaling'
+    """
+    global _current_stage, _stage_started
+    previous_stage = _current_stage
+    previous_started = _stage_started
+    _current_stage = name
+    _stage_started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current_stage = previous_stage
+        _stage_started = previous_started
+
+
+def current_stage():
+    """返回当前阶段名称"""
+    return _current_stage
+
+
+class LoopWatchdog:
+    """
+    事件循环看门狗
+
+    - 采样协程：每隔 interval 秒 sleep 一次，实际唤醒时间与预期的差值即为循环延迟
+    - 监视线程：事件循环超过 threshold 秒没有心跳时，抓取事件循环线程的调用栈并打印
+    """
+
+    def __init__(self, interval=0.05, threshold=0.1, history=2000, report_interval=0):
+        """
+        Args:
+            interval: 延迟采样间隔（秒）
+            threshold: 判定为卡顿的阻塞时长（秒）
+            history: 保留用于计算分位数的采样数
+            report_interval: 定期打印延迟分位数的间隔（秒），0 表示不打印
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.report_interval = report_interval
+        self.lags = deque(maxlen=history)
+        self.stall_count = 0
+        self.stall_stages = {}
+
+        self._loop_thread_id = None
+        self._heartbeat = time.perf_counter()
+        self._reported_heartbeat = None
+        self._running = False
+        self._thread = None
+        self._task = None
+
+    async def start(self):
+        """在当前事件循环中启动看门狗"""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._running = True
+
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+        self._task = asyncio.ensure_future(self._sample())
+
+    async def stop(self):
+        """停止看门狗"""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    async def _sample(self):
+        """采样协程：测量每次 sleep 的超时量"""
+        last_report = time.perf_counter()
+        while self._running:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self.lags.append(max(0.0, now - expected))
+            self._heartbeat = now
+
+            if self.report_interval and now - last_report >= self.report_interval:
+                last_report = now
+                self._print_stats()
+
+    def _watch(self):
+        """监视线程：检测心跳超时并抓取事件循环线程的调用栈"""
+        poll = min(self.interval, self.threshold) / 2
+        while self._running:
+            time.sleep(poll)
+            heartbeat = self._heartbeat
+            blocked = time.perf_counter() - heartbeat - self.interval
+            if blocked < self.threshold or heartbeat == self._reported_heartbeat:
+                continue
+
+            # 同一次阻塞只报告一次
+            self._reported_heartbeat = heartbeat
+            stage_name = _current_stage
+            self.stall_count += 1
+            self.stall_stages[stage_name] = self.stall_stages.get(stage_name, 0) + 1
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame else '  <no stack>\n'
+            print(f"⚠️  Event loop blocked > {blocked * 1000:.0f}ms in stage '{stage_name}'")
+            print(stack, end='')
+
+    def get_stats(self):
+        """
+        获取循环延迟统计
+
+        Returns:
+            dict: 延迟分位数（毫秒）、卡顿次数及各阶段卡顿计数
+        """
+        samples = sorted(self.lags)
+        stats = {
+            'samples': len(samples),
+            'p50_ms': 0.0,
+            'p95_ms': 0.0,
+            'p99_ms': 0.0,
+            'max_ms': 0.0,
+            'stalls': self.stall_count,
+            'stall_stages': dict(self.stall_stages),
+        }
+        if samples:
+            for name, q in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+                stats[name] = samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+            stats['max_ms'] = samples[-1] * 1000
+        return stats
+
+    def _print_stats(self):
+        """打印延迟分位数"""
+        s = self.get_stats()
+        print(f"⏱️  Loop lag p50={s['p50_ms']:.1f}ms p95={s['p95_ms']:.1f}ms "
+              f"p99={s['p99_ms']:.1f}ms max={s['max_ms']:.1f}ms stalls={s['stalls']}")
@@ -4,26 +4,50 @@
 """
 import asyncio
 import argparse
-from robot_sim import VirtualRobot
-from stereo_camera import StereoCamera
-from webrtc_server import WebRTCServer
+import functools
+import time
 from signaling_server import SignalingServer
+from loop_watchdog import LoopWatchdog, stage
 
 
-async def simulation_loop(robot, interval=1/240):
+def import_pipeline_modules():
+    """
+    导入渲染/仿真/WebRTC 相关的重量级模块（pybullet、cv2、aiortc、av）
+
+    在线程池中执行，使信令服务在导入期间就能接受连接
+    """
+    import robot_sim
+    import stereo_camera
+    import webrtc_server
+    import frame_publisher
+    import ray_sensor
+
+
+async def simulation_loop(robot, interval=1/240, sensors=()):
     """
     物理仿真循环
 
     Args:
         robot: VirtualRobot 实例
         interval: 仿真步长（秒），默认 240Hz
+        sensors: 按仿真步调度的传感器列表（如 RaySensor）
     """
+    tick = 0
     while True:
-        robot.step_simulation()
+        with stage('physics'):
+            robot.step_simulation()
+        if sensors:
+            with stage('sensors'):
+                for sensor in sensors:
+                    sensor.on_tick(tick)
+        tick += 1
         await asyncio.sleep(interval)
 
 
-async def main(use_gui=False, fps=30, resolution=(640, 480), use_ssl=True, test_pattern=False, video_mode='sbs'):
+async def main(use_gui=False, fps=30, resolution=(640, 480), use_ssl=True, test_pattern=False, video_mode='sbs',
+               watchdog_threshold=0.1, watchdog_report=0, shm_name=None, shm_depth=False, shm_replace=False,
+               lidar_rate=0, scene_file=None, monitor_fps=0, admin_token=None,
+               profile_dir='profiles'):
     """
     主函数
 
@@ -34,6 +58,16 @@ async def main(use_gui=False, fps=30, resolution=(640, 480), use_ssl=True, test_
         use_ssl: 是否使用 SSL (WSS)
         test_pattern: 是否使用测试图案（调试用）
         video_mode: 'sbs' (Side-by-Side 单轨道) 或 'dual' (双轨道)
+        watchdog_threshold: 事件循环卡顿阈值（秒），0 表示关闭看门狗
+        watchdog_report: 打印循环延迟分位数的间隔（秒），0 表示不打印
+        shm_name: 共享内存帧发布名称，None 表示不发布
+        shm_depth: 是否同时发布深度图
+        shm_replace: 同名共享内存仍在被使用时是否强制替换
+        lidar_rate: 模拟激光雷达更新频率（Hz），0 表示不启用
+        scene_file: 场景描述文件（JSON/YAML），None 表示默认场景
+        monitor_fps: 第三人称监控相机帧率，0 表示不启用
+        admin_token: 允许通过信令发起采样分析的管理员令牌，None 表示禁用
+        profile_dir: 采样分析结果输出目录
     """
     print("🤖 Virtual Robot VR Teleoperation System")
     print(f"Server starting on port 8080...")
@@ -43,25 +77,102 @@ async def main(use_gui=False, fps=30, resolution=(640, 480), use_ssl=True, test_
         print("Test pattern mode enabled")
     print()
 
-    # 初始化组件
-    robot = VirtualRobot(use_gui=use_gui)
-    camera = StereoCamera(robot, width=resolution[0], height=resolution[1], fov=90, ipd=0.064)
-    webrtc_server = WebRTCServer(robot, camera, fps=fps, test_pattern=test_pattern, video_mode=video_mode)
-    signaling = SignalingServer(webrtc_server)
+    startup_time = time.perf_counter()
+
+    # 先启动信令服务，渲染管线就绪前收到的 offer 会等待
+    signaling = SignalingServer(admin_token=admin_token, profile_dir=profile_dir)
+    signaling_task = asyncio.ensure_future(signaling.start(host='0.0.0.0', port=8080, use_ssl=use_ssl))
+    listening_task = asyncio.ensure_future(signaling.listening.wait())
+    await asyncio.wait([signaling_task, listening_task], return_when=asyncio.FIRST_COMPLETED)
+    if signaling_task.done():
+        listening_task.cancel()
+        signaling_task.result()  # 启动失败（如端口被占用）时抛出异常
+    print(f"Signaling listening after {(time.perf_counter() - startup_time) * 1000:.0f}ms")
 
-    print("✅ Server ready")
-    print("Press Ctrl+C to stop\n")
+    robot = None
+    webrtc_server = None
+    publisher = None
+    watchdog = None
 
     try:
+        # 导入重量级模块
+        import_start = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(None, import_pipeline_modules)
+        import_ms = (time.perf_counter() - import_start) * 1000
+
+        from robot_sim import VirtualRobot
+        from stereo_camera import StereoCamera
+        from webrtc_server import WebRTCServer
+        from frame_publisher import FramePublisher
+        from ray_sensor import RaySensor
+
+        # 初始化组件
+        world_start = time.perf_counter()
+        if use_gui:
+            # GUI 窗口需要在主线程创建
+            robot = VirtualRobot(use_gui=True, scene_file=scene_file)
+        else:
+            # 加载模型和场景不阻塞事件循环，期间信令服务可以正常响应
+            robot = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(VirtualRobot, use_gui=False, scene_file=scene_file))
+        world_ms = (time.perf_counter() - world_start) * 1000
+        camera = StereoCamera(robot, width=resolution[0], height=resolution[1], fov=90, ipd=0.064)
+
+        sensors = []
+        if lidar_rate > 0:
+            sensors.append(RaySensor(robot, rate=lidar_rate, sim_rate=240))
+            print(f"Lidar: {len(sensors[0].directions)} rays @ {lidar_rate}Hz")
+
+        if shm_name:
+            camera.capture_depth = shm_depth
+            publisher = FramePublisher(shm_name, width=resolution[0] * 2, height=resolution[1],
+                                       max_joints=robot.num_joints, with_depth=shm_depth,
+                                       replace=shm_replace)
+            print(f"Publishing frames to shared memory '{shm_name}'")
+
+        webrtc_server = WebRTCServer(robot, camera, fps=fps, test_pattern=test_pattern, video_mode=video_mode,
+                                     publisher=publisher)
+        signaling.set_webrtc_server(webrtc_server)
+        signaling.add_stats_source('render', webrtc_server.scheduler.get_stats)
+
+        if monitor_fps > 0:
+            # 第三人称监控相机：只使用操作员相机之外的剩余渲染预算，
+            # 仅在有客户端通过信令 'camera-frame' 拉取时渲染
+            webrtc_server.scheduler.register(
+                'third_person',
+                lambda width, height: camera.render_view([-2.0, 0, 2.0], [0, 0, 0.5], width=width, height=height),
+                rate=monitor_fps,
+                resolution=(320, 240),
+                priority=0,
+                on_demand=True
+            )
+            print(f"Monitor camera: third_person 320x240 @ {monitor_fps}fps (on request)")
+
+        if watchdog_threshold > 0:
+            watchdog = LoopWatchdog(threshold=watchdog_threshold, report_interval=watchdog_report)
+            await watchdog.start()
+            signaling.add_stats_source('loop', watchdog.get_stats)
+
+        print(f"✅ Server ready after {(time.perf_counter() - startup_time) * 1000:.0f}ms "
+              f"(imports {import_ms:.0f}ms, world {world_ms:.0f}ms)")
+        print("Press Ctrl+C to stop\n")
+
         await asyncio.gather(
-            signaling.start(host='0.0.0.0', port=8080, use_ssl=use_ssl),
-            simulation_loop(robot, interval=1/240)
+            signaling_task,
+            simulation_loop(robot, interval=1/240, sensors=sensors)
         )
     except KeyboardInterrupt:
         print("\n\nShutting down...")
     finally:
-        await webrtc_server.close()
-        robot.close()
+        signaling_task.cancel()
+        if watchdog:
+            await watchdog.stop()
+        if webrtc_server:
+            await webrtc_server.close()
+        if publisher:
+            publisher.close()
+        if robot:
+            robot.close()
         print("✅ Server stopped")
 
 
@@ -76,6 +187,25 @@ if __name__ == '__main__':
     parser.add_argument('--test-pattern', action='store_true', help='使用测试图案（调试立体视觉）')
     parser.add_argument('--video-mode', type=str, default='sbs', choices=['sbs', 'dual'],
                         help='视频传输模式: sbs (Side-by-Side 单轨道, 默认) 或 dual (双轨道)')
+    parser.add_argument('--watchdog-threshold', type=float, default=0.1,
+                        help='事件循环卡顿告警阈值，秒（默认: 0.1，0 表示关闭）')
+    parser.add_argument('--watchdog-report', type=float, default=0,
+                        help='打印循环延迟分位数的间隔，秒（默认: 0，不打印）')
+    parser.add_argument('--shm-name', type=str, default=None,
+                        help='将 SBS 帧和机器人状态发布到指定名称的共享内存（默认: 不发布）')
+    parser.add_argument('--shm-depth', action='store_true', help='共享内存中同时发布深度图')
+    parser.add_argument('--shm-replace', action='store_true',
+                        help='同名共享内存仍被其他进程使用时强制替换（默认: 拒绝启动）')
+    parser.add_argument('--lidar-rate', type=float, default=0,
+                        help='模拟激光雷达更新频率，Hz（默认: 0，不启用）')
+    parser.add_argument('--scene', type=str, default=None,
+                        help='场景描述文件 JSON/YAML（默认: scenes/default.json）')
+    parser.add_argument('--monitor-fps', type=float, default=0,
+                        help='第三人称监控相机帧率（默认: 0，不启用），只使用剩余渲染预算')
+    parser.add_argument('--admin-token', type=str, default=None,
+                        help='管理员令牌，用于通过信令通道触发采样分析（默认: 禁用）')
+    parser.add_argument('--profile-dir', type=str, default='profiles',
+                        help='采样分析结果输出目录（默认: profiles）')
 
     args = parser.parse_args()
 
@@ -86,6 +216,16 @@ if __name__ == '__main__':
         resolution=(args.width, args.height),
         use_ssl=not args.no_ssl,
         test_pattern=args.test_pattern,
-        video_mode=args.video_mode
+        video_mode=args.video_mode,
+        watchdog_threshold=args.watchdog_threshold,
+        watchdog_report=args.watchdog_report,
+        shm_name=args.shm_name,
+        shm_depth=args.shm_depth,
+        shm_replace=args.shm_replace,
+        lidar_rate=args.lidar_rate,
+        scene_file=args.scene,
+        monitor_fps=args.monitor_fps,
+        admin_token=args.admin_token,
+        profile_dir=args.profile_dir
     ))
 
@@ -0,0 +1,203 @@
+"""
+弱网模拟模块
+在进程内对 aiortc 对等连接的 ICE 传输层施加丢包、延迟、抖动和带宽限制，
+作用于该连接上的全部 RTP/RTCP 和 DataChannel（SCTP）流量，无需内核 netem
+"""
+import asyncio
+import random
+import time
+
+
+class LinkProfile:
+    """单方向链路参数"""
+
+    def __init__(self, loss=0.0, delay=0.0, jitter=0.0, bandwidth=None, queue_delay=0.2, reorder=True):
+        """
+        Args:
+            loss: 丢包率 [0, 1]
+            delay: 固定单向延迟（秒）
+            jitter: 延迟抖动（秒，正态分布标准差）
+            bandwidth: 带宽上限（bit/s），None 表示不限
+            queue_delay: 带宽受限时的最大排队时延（秒），超出即尾部丢弃（模拟路由器缓冲区）
+            reorder: 是否允许抖动导致乱序；False 时包按发送顺序到达
+        """
+        self.loss = loss
+        self.delay = delay
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.queue_delay = queue_delay
+        self.reorder = reorder
+
+    @property
+    def is_ideal(self):
+        return not (self.loss or self.delay or self.jitter or self.bandwidth)
+
+
+class ImpairedLink:
+    """
+    单方向链路模拟器
+
+    每个数据包依次经过：随机丢包 → 带宽排队（超出缓冲尾部丢弃）→ 固定延迟 + 抖动，
+    然后在计算出的到达时间通过 deliver 回调交付
+    """
+
+    def __init__(self, profile, seed=None):
+        """
+        Args:
+            profile: LinkProfile
+            seed: 随机种子，便于复现同一组丢包序列
+        """
+        self.profile = profile
+        self.random = random.Random(seed)
+        self._link_free_at = 0.0
+        self._last_arrival = 0.0
+        self.packets = 0
+        self.bytes = 0
+        self.lost = 0
+        self.queue_dropped = 0
+        self.delivered = 0
+
+    def submit(self, data, deliver):
+        """
+        提交一个数据包
+
+        Args:
+            data: 数据包
+            deliver: 到达时调用的回调 deliver(data)
+        """
+        profile = self.profile
+        self.packets += 1
+        self.bytes += len(data)
+
+        if profile.loss and self.random.random() < profile.loss:
+            self.lost += 1
+            return
+
+        now = time.perf_counter()
+        arrival = now
+        if profile.bandwidth:
+            start = max(now, self._link_free_at)
+            if start - now > profile.queue_delay:
+                self.queue_dropped += 1
+                return
+            self._link_free_at = start + len(data) * 8 / profile.bandwidth
+            arrival = self._link_free_at
+
+        arrival += profile.delay
+        if profile.jitter:
+            arrival += abs(self.random.gauss(0.0, profile.jitter))
+        if not profile.reorder:
+            arrival = max(arrival, self._last_arrival)
+        self._last_arrival = arrival
+
+        self.delivered += 1
+        delay = arrival - now
+        if delay <= 0:
+            deliver(data)
+        else:
+            asyncio.get_running_loop().call_later(delay, deliver, data)
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: 包数、字节数、随机丢包数、缓冲溢出丢包数、交付数
+        """
+        return {
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'lost': self.lost,
+            'queue_dropped': self.queue_dropped,
+            'delivered': self.delivered,
+        }
+
+
+class NetworkShim:
+    """
+    对一个 RTCPeerConnection 施加弱网条件
+
+    替换其 RTCIceTransport 的 _send / _recv（DTLS 层通过这两个方法收发所有数据报），
+    uplink 作用于本端发出的数据，downlink 作用于本端收到的数据。
+    在 createOffer/setLocalDescription 之前、添加完轨道和 DataChannel 之后调用 attach()。
+    """
+
+    def __init__(self, uplink=None, downlink=None, seed=None):
+        """
+        Args:
+            uplink: 本端 → 对端 的 LinkProfile
+            downlink: 对端 → 本端 的 LinkProfile
+            seed: 随机种子
+        """
+        self.uplink = ImpairedLink(uplink or LinkProfile(), seed=seed)
+        self.downlink = ImpairedLink(downlink or LinkProfile(), seed=None if seed is None else seed + 1)
+        self._patched = set()
+
+    def attach(self, pc):
+        """
+        挂载到对等连接的所有 ICE 传输上
+
+        Args:
+            pc: aiortc RTCPeerConnection
+        """
+        for transport in self._ice_transports(pc):
+            if id(transport) in self._patched:
+                continue
+            self._patched.add(id(transport))
+            self._patch(transport)
+
+    @staticmethod
+    def _ice_transports(pc):
+        transports = []
+        for transceiver in pc.getTransceivers():
+            transports.append(transceiver.sender.transport.transport)
+        if pc.sctp is not None:
+            transports.append(pc.sctp.transport.transport)
+        return transports
+
+    def _patch(self, ice_transport):
+        send = ice_transport._send
+        recv = ice_transport._recv
+        inbox = asyncio.Queue()
+        reader = None
+
+        def deliver_out(data):
+            asyncio.ensure_future(self._send_quietly(send, data))
+
+        async def impaired_send(data):
+            self.uplink.submit(data, deliver_out)
+
+        async def read_loop():
+            while True:
+                try:
+                    data = await recv()
+                except Exception as e:
+                    # 连接关闭等异常原样传递给接收方
+                    inbox.put_nowait(e)
+                    return
+                self.downlink.submit(data, inbox.put_nowait)
+
+        async def impaired_recv():
+            nonlocal reader
+            if reader is None:
+                reader = asyncio.ensure_future(read_loop())
+            item = await inbox.get()
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+        ice_transport._send = impaired_send
+        ice_transport._recv = impaired_recv
+
+    @staticmethod
+    async def _send_quietly(send, data):
+        try:
+            await send(data)
+        except ConnectionError:
+            # 延迟期间连接已关闭，与真实网络中丢包等价
+            pass
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: {'uplink': {...}, 'downlink': {...}}
+        """
+        return {'uplink': self.uplink.get_stats(), 'downlink': self.downlink.get_stats()}
@@ -0,0 +1,183 @@
+"""
+射线传感器模块
+基于 p.rayTestBatch 的批量射线检测（模拟激光雷达 / VR 手柄指向），结果以连续 NumPy 数组返回
+"""
+import pybullet as p
+import numpy as np
+
+
+# PyBullet 单次 rayTestBatch 的射线数量上限
+MAX_RAYS_PER_BATCH = 16384
+
+# 机器人自身所在的碰撞过滤组（避开 Bullet 预定义的 Default/Static/Kinematic/Debris/Sensor/Character 位）
+ROBOT_COLLISION_GROUP = 1 << 10
+
+
+def lidar_directions(horizontal_rays=360, vertical_rays=16, horizontal_fov=360.0, vertical_fov=30.0):
+    """
+    预计算激光雷达射线方向表（传感器坐标系：X-前，Y-左，Z-上）
+
+    Args:
+        horizontal_rays: 水平方向射线数
+        vertical_rays: 垂直方向线数
+        horizontal_fov: 水平视场角（度）
+        vertical_fov: 垂直视场角（度），以水平面为中心
+
+    Returns:
+        directions: (vertical_rays * horizontal_rays, 3) float64 单位向量
+    """
+    if horizontal_fov >= 360.0:
+        yaw = np.linspace(-np.pi, np.pi, horizontal_rays, endpoint=False)
+    else:
+        half = np.radians(horizontal_fov) / 2
+        yaw = np.linspace(-half, half, horizontal_rays)
+
+    if vertical_rays > 1:
+        half = np.radians(vertical_fov) / 2
+        pitch = np.linspace(-half, half, vertical_rays)
+    else:
+        pitch = np.zeros(1)
+
+    pitch_grid, yaw_grid = np.meshgrid(pitch, yaw, indexing='ij')
+    cos_pitch = np.cos(pitch_grid)
+    directions = np.stack([
+        cos_pitch * np.cos(yaw_grid),
+        cos_pitch * np.sin(yaw_grid),
+        np.sin(pitch_grid),
+    ], axis=-1)
+    return np.ascontiguousarray(directions.reshape(-1, 3))
+
+
+class RayScan:
+    """一次射线检测的结果（所有字段均为长度 N 的连续数组）"""
+
+    __slots__ = ('distances', 'body_ids', 'link_ids', 'positions', 'normals', 'tick')
+
+    def __init__(self, distances, body_ids, link_ids, positions, normals, tick=0):
+        self.distances = distances  # (N,) float32，未命中为 max_range
+        self.body_ids = body_ids    # (N,) int32，未命中为 -1
+        self.link_ids = link_ids    # (N,) int32
+        self.positions = positions  # (N, 3) float32，世界坐标命中点
+        self.normals = normals      # (N, 3) float32，世界坐标命中法线
+        self.tick = tick            # 产生结果时的仿真步数
+
+    @property
+    def hits(self):
+        """命中掩码"""
+        return self.body_ids >= 0
+
+
+def cast_rays(origins, directions, max_range, num_threads=0, collision_filter_mask=-1):
+    """
+    批量射线检测
+
+    Args:
+        origins: (N, 3) 或 (3,) 射线起点（世界坐标）
+        directions: (N, 3) 单位方向向量（世界坐标）
+        max_range: 最大检测距离（米）
+        num_threads: PyBullet 内部线程数，0 表示自动
+        collision_filter_mask: 只检测碰撞过滤组与该掩码相交的物体，默认全部
+
+    Returns:
+        RayScan
+    """
+    directions = np.asarray(directions, dtype=np.float64)
+    origins = np.broadcast_to(np.asarray(origins, dtype=np.float64), directions.shape)
+    targets = origins + directions * max_range
+
+    n = len(directions)
+    results = []
+    for start in range(0, n, MAX_RAYS_PER_BATCH):
+        end = min(start + MAX_RAYS_PER_BATCH, n)
+        results.extend(p.rayTestBatch(
+            origins[start:end].tolist(),
+            targets[start:end].tolist(),
+            numThreads=num_threads,
+            collisionFilterMask=collision_filter_mask
+        ))
+
+    body_ids = np.empty(n, dtype=np.int32)
+    link_ids = np.empty(n, dtype=np.int32)
+    fractions = np.empty(n, dtype=np.float32)
+    positions = np.empty((n, 3), dtype=np.float32)
+    normals = np.empty((n, 3), dtype=np.float32)
+    if n:
+        body_col, link_col, fraction_col, position_col, normal_col = zip(*results)
+        body_ids[:] = body_col
+        link_ids[:] = link_col
+        fractions[:] = fraction_col
+        positions[:] = position_col
+        normals[:] = normal_col
+
+    return RayScan(fractions * np.float32(max_range), body_ids, link_ids, positions, normals)
+
+
+class RaySensor:
+    """
+    挂载在机器人头部的射线传感器
+
+    方向表在构造时计算一次，每次更新只做一次矩阵乘法和一次批量检测。
+    更新频率按仿真步数调度：由 simulation_loop 每步调用 on_tick(tick)。
+    """
+
+    def __init__(self, robot_sim, directions=None, max_range=10.0, rate=10, sim_rate=240,
+                 offset=(0.0, 0.0, 0.0), exclude_robot=True, num_threads=0):
+        """
+        Args:
+            robot_sim: VirtualRobot 实例
+            directions: (N, 3) 传感器坐标系方向表，默认 lidar_directions()
+            max_range: 最大检测距离（米）
+            rate: 更新频率（Hz）
+            sim_rate: 物理仿真频率（Hz），用于换算更新间隔
+            offset: 相对头部的安装偏移（传感器坐标系，米）
+            exclude_robot: 是否穿透机器人自身（传感器装在头部内部，射线从机器人体内发出）
+            num_threads: PyBullet 内部线程数，0 表示自动
+        """
+        self.robot_sim = robot_sim
+        self.directions = np.ascontiguousarray(
+            lidar_directions() if directions is None else directions, dtype=np.float64)
+        self.max_range = max_range
+        self.rate = rate
+        self.period = max(1, round(sim_rate / rate))
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.exclude_robot = exclude_robot
+        self.num_threads = num_threads
+        self.latest = None
+
+        self.collision_filter_mask = -1
+        if exclude_robot:
+            # 把机器人所有连杆放进单独的过滤组，射线掩码排除该组，
+            # 射线直接穿过机器人并返回其后的第一个物体（碰撞掩码不变，不影响物理）
+            robot_id = robot_sim.robot_id
+            for link in range(-1, p.getNumJoints(robot_id)):
+                p.setCollisionFilterGroupMask(robot_id, link, ROBOT_COLLISION_GROUP, -1)
+            self.collision_filter_mask = ~ROBOT_COLLISION_GROUP
+
+    def on_tick(self, tick):
+        """
+        仿真步回调，到达更新周期时执行一次检测
+
+        Args:
+            tick: 当前仿真步数
+
+        Returns:
+            RayScan 或 None（本步未更新）
+        """
+        if tick % self.period:
+            return None
+        scan = self.scan()
+        scan.tick = tick
+        return scan
+
+    def scan(self):
+        """立即执行一次检测并更新 latest"""
+        position, orientation = self.robot_sim.get_head_pose()
+        rotation = np.array(p.getMatrixFromQuaternion(orientation)).reshape(3, 3)
+
+        origin = np.asarray(position, dtype=np.float64) + rotation @ self.offset
+        world_directions = self.directions @ rotation.T
+
+        scan = cast_rays(origin, world_directions, self.max_range, self.num_threads,
+                         self.collision_filter_mask)
+        self.latest = scan
+        return scan
@@ -0,0 +1,279 @@
+"""
+渲染调度模块
+多个相机按各自的帧率、分辨率和优先级注册；操作员双目相机每个周期按时渲染，
+辅助相机（第三人称、腕部相机等）按最早截止时间优先（EDF）使用剩余预算，超时则跳帧计数
+"""
+import asyncio
+import time
+
+from loop_watchdog import stage
+
+
+def _pixels(resolution):
+    width, height = resolution
+    return max(1, width * height)
+
+
+class RenderJob:
+    """已注册的相机渲染任务"""
+
+    def __init__(self, name, render, rate, resolution, priority, operator, on_demand):
+        self.name = name
+        self.render = render
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.resolution = resolution
+        self.priority = priority
+        self.operator = operator
+        self.on_demand = on_demand
+
+        self.release = 0.0       # 本帧可开始渲染的时间
+        self.frame = None        # 最近一次渲染结果
+        self.seq = 0             # 最近一次渲染结果的序号
+        self.cost = 0.0          # 渲染耗时（指数滑动平均，秒），尚未渲染时为 0
+        self.rendered = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_request = 0.0  # 最近一次有消费者等待帧的时间
+        self._frame_event = asyncio.Event()
+
+    @property
+    def deadline(self):
+        """本帧截止时间：下一帧释放之前必须完成"""
+        return self.release + self.period
+
+    def _run(self):
+        """执行渲染并更新统计"""
+        start = time.perf_counter()
+        try:
+            with stage(f'render:{self.name}'):
+                frame = self.render(*self.resolution)
+        except Exception as e:
+            # 渲染失败时仍然发布（frame 为 None），避免消费者一直等待
+            if self.errors == 0:
+                print(f"⚠️  Render job '{self.name}' failed: {e!r}")
+            self.errors += 1
+            frame = None
+        elapsed = time.perf_counter() - start
+
+        self.cost = elapsed if self.rendered == 0 else 0.8 * self.cost + 0.2 * elapsed
+        self.rendered += 1
+        self.frame = frame
+        self.seq += 1
+
+        # 唤醒所有等待新帧的消费者
+        event, self._frame_event = self._frame_event, asyncio.Event()
+        event.set()
+        return elapsed
+
+
+class RenderScheduler:
+    """
+    渲染调度器
+
+    每个调度周期：
+    1. 渲染所有已到期的操作员相机（不受预算限制）
+    2. 辅助相机按截止时间排序（截止时间相同时优先级高者在前），
+       预计耗时不超过剩余预算才渲染，否则留到下一周期；错过截止时间的帧计为跳帧
+    """
+
+    def __init__(self, aux_budget=0.5, idle_timeout=1.0):
+        """
+        Args:
+            aux_budget: 每个操作员帧周期中可用于渲染的比例（操作员相机耗时之外的部分留给辅助相机）
+            idle_timeout: 按需渲染的相机在多长时间（秒）无人请求后暂停渲染
+        """
+        self.aux_budget = aux_budget
+        self.idle_timeout = idle_timeout
+        self.jobs = {}
+        self._task = None
+        self._wakeup = asyncio.Event()
+
+    def register(self, name, render, rate, resolution, priority=0, operator=False, on_demand=None):
+        """
+        注册相机
+
+        Args:
+            name: 相机名称
+            render: 渲染函数 render(width, height) -> 帧
+            rate: 目标帧率（Hz）
+            resolution: (width, height)
+            priority: 优先级（数值越大越优先，仅在辅助相机之间比较）
+            operator: 是否为操作员相机（始终按时渲染）
+            on_demand: 是否只在有消费者等待时渲染，默认与 operator 相同
+
+        Returns:
+            RenderJob
+        """
+        if on_demand is None:
+            on_demand = operator
+        job = RenderJob(name, render, rate, tuple(resolution), priority, operator, on_demand)
+        job.release = time.perf_counter()
+        self.jobs[name] = job
+        return job
+
+    def configure(self, name, rate=None, resolution=None):
+        """
+        运行时修改相机的帧率或分辨率，下一帧生效
+
+        Args:
+            name: 相机名称
+            rate: 新帧率（Hz）
+            resolution: 新分辨率 (width, height)
+        """
+        job = self.jobs[name]
+        if rate is not None:
+            job.rate = rate
+            job.period = 1.0 / rate
+            # 降低帧率后不必等满旧周期
+            job.release = min(job.release, time.perf_counter() + job.period)
+        if resolution is not None:
+            resolution = tuple(resolution)
+            if job.rendered and resolution != job.resolution:
+                # 按像素数换算已测得的耗时，避免新分辨率的第一帧按旧耗时通过预算检查
+                job.cost *= _pixels(resolution) / _pixels(job.resolution)
+            job.resolution = resolution
+        self._wakeup.set()
+
+    def unregister(self, name):
+        """注销相机"""
+        self.jobs.pop(name, None)
+
+    def start(self):
+        """在当前事件循环中启动调度（重复调用无副作用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        """停止调度"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait_frame(self, name, after_seq=0):
+        """
+        等待相机产生比 after_seq 更新的帧
+
+        Args:
+            name: 相机名称
+            after_seq: 消费者已拿到的最新序号
+
+        Returns:
+            (seq, frame)，渲染失败时 frame 为 None
+        """
+        self.start()
+        job = self.jobs[name]
+        while job.seq <= after_seq:
+            job.last_request = time.perf_counter()
+            # 暂停中的按需相机需要立即唤醒调度循环
+            self._wakeup.set()
+            await job._frame_event.wait()
+        return job.seq, job.frame
+
+    def latest(self, name):
+        """
+        获取相机最近一帧（不等待）
+
+        Returns:
+            (seq, frame)，尚未渲染时 frame 为 None
+        """
+        job = self.jobs[name]
+        job.last_request = time.perf_counter()
+        return job.seq, job.frame
+
+    async def run(self):
+        """调度循环"""
+        while True:
+            now = time.perf_counter()
+            self._wakeup.clear()
+            self.tick(now)
+
+            # 睡到下一个相机释放时间；因预算不足而顺延的辅助相机在下一个周期处理
+            releases = [job.release for job in self.jobs.values()
+                        if self._active(job, now) and job.release > now]
+            delay = (min(releases) - time.perf_counter()) if releases else self.idle_timeout
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, delay))
+            except asyncio.TimeoutError:
+                pass
+
+    def tick(self, now):
+        """执行一个调度周期"""
+        tick_start = time.perf_counter()
+        operator_period = None
+
+        for job in self.jobs.values():
+            if not job.operator or not self._active(job, now):
+                continue
+            operator_period = job.period if operator_period is None else min(operator_period, job.period)
+            if job.release <= now:
+                job._run()
+                # 落后超过一帧时不补帧，直接从当前时间重新计时
+                job.release = max(job.release + job.period, now)
+
+        # 辅助相机预算：操作员周期的 aux_budget 比例，扣除本周期操作员渲染耗时
+        if operator_period is None:
+            remaining = float('inf')
+        else:
+            remaining = operator_period * self.aux_budget - (time.perf_counter() - tick_start)
+
+        pending = []
+        for job in self.jobs.values():
+            if job.operator or not self._active(job, now) or job.release > now:
+                continue
+            if job.deadline <= now:
+                # 错过截止时间：跳过这些帧
+                missed = int((now - job.release) / job.period)
+                job.skipped += missed
+                job.release += missed * job.period
+            pending.append(job)
+
+        pending.sort(key=lambda job: (job.deadline, -job.priority))
+        for job in pending:
+            if self._estimated_cost(job) > remaining:
+                continue
+            remaining -= job._run()
+            job.release += job.period
+
+    def _estimated_cost(self, job):
+        """
+        预计渲染耗时
+
+        尚未渲染过的相机没有实测耗时，按已渲染相机中最大的每像素耗时乘以其像素数保守估算
+        （操作员双目相机一次渲染两幅图像，按单眼分辨率计算的每像素耗时偏大）；
+        没有任何实测数据时操作员相机也未在渲染，预算不受限制
+        """
+        if job.rendered:
+            return job.cost
+        per_pixel = [other.cost / _pixels(other.resolution)
+                     for other in self.jobs.values() if other.rendered]
+        return max(per_pixel, default=0.0) * _pixels(job.resolution)
+
+    def _active(self, job, now):
+        """按需渲染的相机只有在最近被请求过时才渲染"""
+        return not job.on_demand or now - job.last_request < self.idle_timeout
+
+    def get_stats(self):
+        """
+        获取各相机的渲染统计
+
+        Returns:
+            dict: {name: {'rate', 'resolution', 'priority', 'operator', 'rendered', 'skipped', 'errors', 'cost_ms'}}
+        """
+        return {
+            name: {
+                'rate': job.rate,
+                'resolution': job.resolution,
+                'priority': job.priority,
+                'operator': job.operator,
+                'rendered': job.rendered,
+                'skipped': job.skipped,
+                'errors': job.errors,
+                'cost_ms': job.cost * 1000,
+            }
+            for name, job in self.jobs.items()
+        }
@@ -6,15 +6,17 @@ import pybullet as p
 import pybullet_data
 import numpy as np
 import time
+from scene_loader import SceneLoader, DEFAULT_SCENE
 
 
 class VirtualRobot:
-    def __init__(self, use_gui=False):
+    def __init__(self, use_gui=False, scene_file=None):
         """
         初始化虚拟机器人
         
         Args:
             use_gui: 是否显示 PyBullet GUI（调试用）
+            scene_file: 场景描述文件（JSON/YAML），默认 scenes/default.json
         """
         # 连接 PyBullet
         if use_gui:
@@ -51,6 +53,7 @@ class VirtualRobot:
             self.head_link_index = 1
 
         # 添加一些物体到场景中（让场景更有趣）
+        self.scene_file = scene_file or DEFAULT_SCENE
         self._setup_scene()
 
         # 获取关节信息
@@ -65,34 +68,9 @@ class VirtualRobot:
         self.head_target_orientation = [0, 0, 0, 1]  # 四元数
     
     def _setup_scene(self):
-        """设置场景中的物体"""
-        cube_positions = [
-            [2.0, 0, 0.5],
-            [0, 2.0, 0.5],
-            [-2.0, 0, 0.5],
-            [0, -2.0, 0.5]
-        ]
-
-        colors = [
-            [1, 0, 0, 1],  # 红色
-            [0, 1, 0, 1],  # 绿色
-            [0, 0, 1, 1],  # 蓝色
-            [1, 1, 0, 1]   # 黄色
-        ]
-
-        for pos, color in zip(cube_positions, colors):
-            cube_collision = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.3, 0.3, 0.3])
-            cube_visual = p.createVisualShape(
-                p.GEOM_BOX,
-                halfExtents=[0.3, 0.3, 0.3],
-                rgbaColor=color
-            )
-            p.createMultiBody(
-                baseMass=1.0,
-                baseCollisionShapeIndex=cube_collision,
-                baseVisualShapeIndex=cube_visual,
-                basePosition=pos
-            )
+        """从场景文件加载场景中的物体"""
+        self.scene_loader = SceneLoader()
+        self.scene_body_ids = self.scene_loader.load_file(self.scene_file)
     
     def step_simulation(self):
         """执行一步物理模拟"""
@@ -157,6 +135,18 @@ class VirtualRobot:
         
         return position, orientation
     
+    def get_joint_positions(self):
+        """
+        获取机器人所有关节的当前角度
+
+        Returns:
+            list: 关节角度（弧度或米），顺序与 joint_indices 一致
+        """
+        if not self.joint_indices:
+            return []
+        states = p.getJointStates(self.robot_id, self.joint_indices)
+        return [state[0] for state in states]
+
     def reset(self):
         """重置机器人到初始状态"""
         p.resetBasePositionAndOrientation(
@@ -0,0 +1,136 @@
+"""
+采样分析模块
+在运行中的进程内对所有线程（事件循环、aiortc 编码线程等）进行定时栈采样，
+输出 pstats 文件（可用 snakeviz / python -m pstats 查看）和折叠栈文件（flamegraph.pl / speedscope）
+"""
+import asyncio
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import loop_watchdog
+
+
+class SamplingProfiler:
+    """
+    进程内采样分析器
+
+    后台线程每隔 interval 秒通过 sys._current_frames() 抓取所有线程的调用栈，
+    并记录采样时事件循环所处的阶段（loop_watchdog.stage），开销与采样频率成正比，与被测代码无关。
+    """
+
+    def __init__(self, interval=0.005):
+        """
+        Args:
+            interval: 采样间隔（秒），默认 200Hz
+        """
+        self.interval = interval
+        self.stacks = Counter()       # (线程名, 帧元组) -> 采样次数
+        self.stage_samples = Counter()
+        self.sample_count = 0
+        self.duration = 0.0
+
+    async def capture(self, duration):
+        """
+        采样 duration 秒（在后台线程中进行，不阻塞事件循环）
+
+        Args:
+            duration: 采样时长（秒）
+        """
+        loop_thread_id = threading.get_ident()
+        stop = threading.Event()
+        thread = threading.Thread(target=self._sample, args=(stop, loop_thread_id),
+                                  name='sampling-profiler', daemon=True)
+        start = time.perf_counter()
+        thread.start()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            stop.set()
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+            self.duration = time.perf_counter() - start
+
+    def _sample(self, stop, loop_thread_id):
+        """采样线程"""
+        own_id = threading.get_ident()
+        while not stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            stage = loop_watchdog.current_stage()
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                stack.reverse()
+                if thread_id == loop_thread_id:
+                    thread_name = 'event-loop'
+                    self.stage_samples[stage] += 1
+                else:
+                    thread_name = names.get(thread_id, f'thread-{thread_id}')
+                self.stacks[(thread_name, tuple(stack))] += 1
+            self.sample_count += 1
+
+    def write_collapsed(self, path):
+        """
+        写出折叠栈文件，每行 "线程;函数;函数 次数"，可直接用于 flamegraph.pl 或 speedscope
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            for (thread_name, stack), count in self.stacks.most_common():
+                frames = [thread_name] + [
+                    f'{name} ({os.path.basename(filename)}:{lineno})' for filename, lineno, name in stack
+                ]
+                f.write(';'.join(frame.replace(';', ':') for frame in frames) + f' {count}\n')
+
+    def write_pstats(self, path):
+        """
+        写出 pstats 兼容文件（时间为采样估计值：次数 x 采样间隔）
+        """
+        stats = {}
+        for (_, stack), count in self.stacks.items():
+            if not stack:
+                continue
+            weight = count * self.interval
+            seen = set()
+            for i, func in enumerate(stack):
+                cc, nc, tt, ct, callers = stats.setdefault(func, (0, 0, 0.0, 0.0, {}))
+                nc += count
+                if func not in seen:
+                    # 递归调用只计一次累计时间
+                    seen.add(func)
+                    cc += count
+                    ct += weight
+                if i == len(stack) - 1:
+                    tt += weight
+                if i > 0:
+                    caller = stack[i - 1]
+                    c_cc, c_nc, c_tt, c_ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                    callers[caller] = (c_cc + count, c_nc + count,
+                                       c_tt + (weight if i == len(stack) - 1 else 0.0), c_ct + weight)
+                stats[func] = (cc, nc, tt, ct, callers)
+
+        with open(path, 'wb') as f:
+            marshal.dump(stats, f)
+
+    def summary(self):
+        """
+        Returns:
+            dict: 采样数、时长、各线程采样数、事件循环各阶段采样占比
+        """
+        threads = Counter()
+        for (thread_name, _), count in self.stacks.items():
+            threads[thread_name] += count
+        loop_total = sum(self.stage_samples.values()) or 1
+        return {
+            'samples': self.sample_count,
+            'duration': round(self.duration, 3),
+            'interval': self.interval,
+            'threads': dict(threads),
+            'stages': {name: round(count / loop_total, 4) for name, count in self.stage_samples.most_common()},
+        }
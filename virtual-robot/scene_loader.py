@@ -0,0 +1,181 @@
+"""
+场景加载模块
+从 JSON / YAML 文件加载场景物体，按几何和颜色复用形状，并通过 batchPositions 批量创建刚体
+"""
+import json
+import os
+
+import pybullet as p
+
+
+DEFAULT_SCENE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenes', 'default.json')
+
+_GEOMETRY = {
+    'box': p.GEOM_BOX,
+    'sphere': p.GEOM_SPHERE,
+    'cylinder': p.GEOM_CYLINDER,
+    'capsule': p.GEOM_CAPSULE,
+}
+
+_IDENTITY_ORIENTATION = (0.0, 0.0, 0.0, 1.0)
+
+
+def read_scene_file(path):
+    """
+    读取场景描述文件
+
+    Args:
+        path: .json 或 .yaml/.yml 文件路径
+
+    Returns:
+        dict: 场景描述 {'objects': [...]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("YAML scene files require PyYAML: pip install pyyaml")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _shape_kwargs(geometry, size):
+    """根据几何类型把 size 转换为 createCollisionShape / createVisualShape 的参数"""
+    if geometry == 'box':
+        return {'halfExtents': list(size)}
+    if geometry == 'sphere':
+        return {'radius': size[0]}
+    # cylinder / capsule: [radius, height]
+    return {'radius': size[0], 'height': size[1]}
+
+
+class SceneLoader:
+    """
+    场景加载器
+
+    场景文件格式（每个条目可以用 position 放置单个物体，也可以用 positions 放置多个同类物体）：
+
+        {
+            "objects": [
+                {"shape": "box", "size": [0.3, 0.3, 0.3], "color": [1, 0, 0, 1],
+                 "mass": 1.0, "position": [2.0, 0, 0.5]},
+                {"shape": "sphere", "size": [0.1], "static": true,
+                 "positions": [[1, 1, 0.1], [1, -1, 0.1]]}
+            ]
+        }
+
+    - 相同几何的碰撞形状、相同几何和颜色的视觉形状只创建一次
+    - 相同形状和质量的物体通过一次 createMultiBody(batchPositions=...) 创建
+    - static 物体质量为 0，不参与动力学积分；动态物体可通过 sleep 允许休眠
+    """
+
+    def __init__(self):
+        self.collision_shapes = {}
+        self.visual_shapes = {}
+        self.body_ids = []
+
+    def load_file(self, path):
+        """
+        加载场景文件
+
+        Args:
+            path: 场景文件路径
+
+        Returns:
+            list: 创建的刚体 ID
+        """
+        return self.load(read_scene_file(path))
+
+    def load(self, scene):
+        """
+        加载场景描述
+
+        Args:
+            scene: 场景描述字典
+
+        Returns:
+            list: 本次创建的刚体 ID
+        """
+        # 批量加载期间关闭渲染，GUI 模式下可显著缩短加载时间
+        p.configureDebugVisualizer(p.COV_ENABLE_RENDERING, 0)
+        try:
+            batches = self._group(scene.get('objects', []))
+            created = []
+            for (collision, visual, mass, sleep), items in batches.items():
+                created.extend(self._create_batch(collision, visual, mass, sleep, items))
+        finally:
+            p.configureDebugVisualizer(p.COV_ENABLE_RENDERING, 1)
+
+        self.body_ids.extend(created)
+        return created
+
+    def _group(self, objects):
+        """按 (碰撞形状, 视觉形状, 质量, 休眠) 对物体分组"""
+        batches = {}
+        for obj in objects:
+            shape = obj.get('shape', 'box')
+            if shape not in _GEOMETRY:
+                raise ValueError(f"Unsupported shape '{shape}', expected one of {sorted(_GEOMETRY)}")
+            positions = obj['positions'] if 'positions' in obj else [obj.get('position', (0, 0, 0))]
+            if not positions:
+                # "positions": [] 表示该类物体暂不放置
+                continue
+            size = tuple(obj.get('size', (0.5, 0.5, 0.5)))
+            color = tuple(obj.get('color', (1, 1, 1, 1)))
+            static = obj.get('static', False)
+            mass = 0.0 if static else float(obj.get('mass', 1.0))
+            sleep = bool(obj.get('sleep', False)) and not static
+
+            collision = self._collision_shape(shape, size)
+            visual = self._visual_shape(shape, size, color)
+
+            orientation = tuple(obj.get('orientation', _IDENTITY_ORIENTATION))
+            items = batches.setdefault((collision, visual, mass, sleep), [])
+            items.extend((list(pos), orientation) for pos in positions)
+        return batches
+
+    def _collision_shape(self, shape, size):
+        key = (shape, size)
+        if key not in self.collision_shapes:
+            self.collision_shapes[key] = p.createCollisionShape(_GEOMETRY[shape], **_shape_kwargs(shape, size))
+        return self.collision_shapes[key]
+
+    def _visual_shape(self, shape, size, color):
+        key = (shape, size, color)
+        if key not in self.visual_shapes:
+            kwargs = _shape_kwargs(shape, size)
+            if 'height' in kwargs:
+                # createVisualShape 使用 length 表示圆柱/胶囊高度
+                kwargs['length'] = kwargs.pop('height')
+            self.visual_shapes[key] = p.createVisualShape(_GEOMETRY[shape], rgbaColor=list(color), **kwargs)
+        return self.visual_shapes[key]
+
+    def _create_batch(self, collision, visual, mass, sleep, items):
+        """用一次 createMultiBody 调用创建同组物体"""
+        positions = [pos for pos, _ in items]
+        if not positions:
+            # batchPositions 为空时 createMultiBody 仍会在原点创建一个物体
+            return []
+        if len(positions) == 1:
+            ids = [p.createMultiBody(
+                baseMass=mass,
+                baseCollisionShapeIndex=collision,
+                baseVisualShapeIndex=visual,
+                basePosition=positions[0]
+            )]
+        else:
+            ids = list(p.createMultiBody(
+                baseMass=mass,
+                baseCollisionShapeIndex=collision,
+                baseVisualShapeIndex=visual,
+                batchPositions=positions
+            ))
+
+        # batchPositions 不支持朝向，非默认朝向的物体单独设置
+        for body_id, (pos, orientation) in zip(ids, items):
+            if orientation != _IDENTITY_ORIENTATION:
+                p.resetBasePositionAndOrientation(body_id, pos, orientation)
+            if sleep:
+                p.changeDynamics(body_id, -1, activationState=p.ACTIVATION_STATE_ENABLE_SLEEPING)
+        return ids
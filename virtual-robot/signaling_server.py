@@ -3,10 +3,16 @@
 使用 WebSocket 处理 WebRTC 信令
 """
 import asyncio
+import base64
 import websockets
 import json
 import ssl
 import os
+import hmac
+import math
+import time
+from loop_watchdog import stage
+from sampling_profiler import SamplingProfiler
 
 
 class SignalingServer:
@@ -15,13 +21,44 @@ class SignalingServer:
     负责 WebRTC 的 SDP 和 ICE Candidate 交换
     """
     
-    def __init__(self, webrtc_server):
+    # 单次采样分析的最长时长（秒）
+    MAX_PROFILE_DURATION = 60
+    # 采样间隔范围（秒）：过小会使采样线程空转占满 CPU，过大则样本太少
+    MIN_PROFILE_INTERVAL = 0.001
+    MAX_PROFILE_INTERVAL = 0.1
+
+    def __init__(self, webrtc_server=None, admin_token=None, profile_dir='profiles'):
         """
         Args:
-            webrtc_server: WebRTCServer 实例
+            webrtc_server: WebRTCServer 实例；可为 None，渲染管线就绪后通过 set_webrtc_server 设置
+            admin_token: 管理员令牌，携带该令牌的 'profile' 消息才会被执行；None 表示禁用
+            profile_dir: 采样分析结果输出目录
         """
-        self.webrtc_server = webrtc_server
+        self.webrtc_server = None
         self.clients = set()
+        self.ready = asyncio.Event()
+        self.listening = asyncio.Event()
+        self.admin_token = admin_token
+        self.profile_dir = profile_dir
+        self.stats_sources = {}
+        self._profiling = False
+        if webrtc_server:
+            self.set_webrtc_server(webrtc_server)
+
+    def add_stats_source(self, name, get_stats):
+        """
+        注册附加到采样分析结果中的统计数据来源
+
+        Args:
+            name: 名称，如 'loop'、'render'
+            get_stats: 返回可 JSON 序列化字典的函数
+        """
+        self.stats_sources[name] = get_stats
+
+    def set_webrtc_server(self, webrtc_server):
+        """设置 WebRTCServer，之前等待中的 offer 将继续处理"""
+        self.webrtc_server = webrtc_server
+        self.ready.set()
     
     async def handler(self, websocket):
         """
@@ -35,21 +72,33 @@ class SignalingServer:
         try:
             async for message in websocket:
                 try:
-                    data = json.loads(message)
+                    with stage('signaling'):
+                        data = json.loads(message)
                     msg_type = data.get('type')
 
                     if msg_type == 'offer':
-                        answer = await self.webrtc_server.handle_offer(data)
+                        await self.ready.wait()
+                        answer = await self.webrtc_server.handle_offer(data, session=websocket)
                         await websocket.send(json.dumps(answer))
 
                     elif msg_type == 'ice-candidate':
                         candidate = data.get('candidate')
                         if candidate:
-                            await self.webrtc_server.add_ice_candidate(candidate)
+                            await self.ready.wait()
+                            await self.webrtc_server.add_ice_candidate(candidate, session=websocket)
 
                     elif msg_type == 'ping':
                         await websocket.send(json.dumps({'type': 'pong'}))
 
+                    elif msg_type == 'profile':
+                        await websocket.send(json.dumps(await self.handle_profile(data)))
+
+                    elif msg_type == 'configure':
+                        await websocket.send(json.dumps(await self.handle_configure(websocket, data)))
+
+                    elif msg_type == 'camera-frame':
+                        await websocket.send(json.dumps(await self.handle_camera_frame(data)))
+
                 except:
                     pass
 
@@ -58,7 +107,132 @@ class SignalingServer:
 
         finally:
             self.clients.remove(websocket)
+            if self.webrtc_server:
+                self.webrtc_server.end_session(websocket)
     
+    def _is_admin(self, data):
+        """检查消息是否携带正确的管理员令牌"""
+        token = data.get('token')
+        return bool(self.admin_token) and isinstance(token, str) and \
+            hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    async def handle_configure(self, websocket, data):
+        """
+        运行时修改管线参数（仅限管理员）
+
+        Args:
+            websocket: 发起请求的连接（不会收到广播）
+            data: {'type': 'configure', 'token': str,
+                   'fps'?, 'width'?, 'height'?, 'video_mode'?, 'ipd'?, 'fov'?}
+
+        Returns:
+            dict: {'type': 'config-result', 'config': {...}, 'renegotiate': bool}
+                  或 {'type': 'config-error', 'error': str}
+        """
+        if not self._is_admin(data):
+            return {'type': 'config-error', 'error': 'forbidden'}
+        await self.ready.wait()
+
+        changes = {key: data[key] for key in ('fps', 'width', 'height', 'video_mode', 'ipd', 'fov')
+                   if data.get(key) is not None}
+        try:
+            result = self.webrtc_server.configure(**changes)
+        except (TypeError, ValueError) as e:
+            return {'type': 'config-error', 'error': str(e)}
+
+        print(f"⚙️  Pipeline reconfigured: {result['config']}")
+
+        # 通知其他客户端；renegotiate 为 True 时客户端需重新发送 offer 以获得新的轨道布局
+        notice = json.dumps({'type': 'config', **result})
+        for client in list(self.clients):
+            if client is not websocket:
+                try:
+                    await client.send(notice)
+                except websockets.exceptions.ConnectionClosed:
+                    pass
+
+        return {'type': 'config-result', **result}
+
+    async def handle_camera_frame(self, data):
+        """
+        获取辅助相机（如 --monitor-fps 的第三人称相机）的最新一帧
+
+        Args:
+            data: {'type': 'camera-frame', 'camera': str}
+
+        Returns:
+            dict: {'type': 'camera-frame', 'camera': str, 'seq': int, 'jpeg': base64 str}
+                  或 {'type': 'camera-error', 'camera': str, 'error': str}
+        """
+        name = data.get('camera', 'third_person')
+        await self.ready.wait()
+        try:
+            seq, jpeg = await self.webrtc_server.get_camera_frame(name)
+        except KeyError:
+            return {'type': 'camera-error', 'camera': name, 'error': 'unknown camera'}
+        except asyncio.TimeoutError:
+            return {'type': 'camera-error', 'camera': name, 'error': 'timeout'}
+        except RuntimeError as e:
+            return {'type': 'camera-error', 'camera': name, 'error': str(e)}
+
+        return {'type': 'camera-frame', 'camera': name, 'seq': seq,
+                'jpeg': base64.b64encode(jpeg).decode('ascii')}
+
+    async def handle_profile(self, data):
+        """
+        执行一次限时采样分析（仅限管理员）
+
+        Args:
+            data: {'type': 'profile', 'token': str, 'duration': float, 'interval': float}
+
+        Returns:
+            dict: {'type': 'profile-result', 'files': [...], 'summary': {...}, 'stats': {...}}
+                  或 {'type': 'profile-error', 'error': str}
+        """
+        if not self._is_admin(data):
+            return {'type': 'profile-error', 'error': 'forbidden'}
+        if self._profiling:
+            return {'type': 'profile-error', 'error': 'busy'}
+
+        try:
+            duration = float(data.get('duration', 10))
+            interval = float(data.get('interval', 0.005))
+        except (TypeError, ValueError):
+            return {'type': 'profile-error', 'error': 'duration and interval must be numbers'}
+        if not (math.isfinite(duration) and 0 < duration <= self.MAX_PROFILE_DURATION):
+            return {'type': 'profile-error',
+                    'error': f'duration must be in (0, {self.MAX_PROFILE_DURATION}] seconds'}
+        if not math.isfinite(interval):
+            return {'type': 'profile-error', 'error': 'interval must be a finite number'}
+        interval = min(max(interval, self.MIN_PROFILE_INTERVAL), self.MAX_PROFILE_INTERVAL)
+        profiler = SamplingProfiler(interval=interval)
+
+        self._profiling = True
+        try:
+            print(f"🔬 Profiling for {duration:g}s (interval {interval * 1000:g}ms)...")
+            await profiler.capture(duration)
+        finally:
+            self._profiling = False
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        prefix = os.path.join(self.profile_dir, time.strftime('profile-%Y%m%d-%H%M%S'))
+        files = [prefix + '.pstats', prefix + '.collapsed', prefix + '.json']
+        profiler.write_pstats(files[0])
+        profiler.write_collapsed(files[1])
+
+        stats = {}
+        for name, get_stats in self.stats_sources.items():
+            try:
+                stats[name] = get_stats()
+            except Exception as e:
+                stats[name] = {'error': repr(e)}
+        result = {'summary': profiler.summary(), 'stats': stats}
+        with open(files[2], 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, default=str)
+
+        print(f"🔬 Profile written to {prefix}.*")
+        return {'type': 'profile-result', 'files': files, **result}
+
     async def start(self, host='0.0.0.0', port=8080, use_ssl=True):
         """
         启动信令服务器
@@ -79,5 +253,6 @@ class SignalingServer:
                 ssl_context.load_cert_chain(cert_file, key_file)
 
         async with websockets.serve(self.handler, host, port, ssl=ssl_context):
+            self.listening.set()
             await asyncio.Future()  # 永久运行
 
@@ -24,14 +24,44 @@ class StereoCamera:
         self.height = height
         self.fov = fov
         self.ipd = ipd
+
+        # 是否保留最近一次渲染的深度缓冲（供共享内存发布使用）
+        self.capture_depth = False
+        self.last_depth = None
         
         # 计算投影矩阵
-        aspect = width / height
+        self._update_projection()
+
+    def _update_projection(self):
+        """根据当前分辨率和视场角计算投影矩阵"""
+        aspect = self.width / self.height
         near = 0.01
         far = 100
         self.projection_matrix = p.computeProjectionMatrixFOV(
-            fov, aspect, near, far
+            self.fov, aspect, near, far
         )
+
+    def configure(self, width=None, height=None, fov=None, ipd=None):
+        """
+        运行时修改相机参数，下一帧生效
+
+        Args:
+            width: 图像宽度
+            height: 图像高度
+            fov: 视场角（度）
+            ipd: 瞳距（米）
+        """
+        if width is not None:
+            self.width = width
+        if height is not None:
+            self.height = height
+        if fov is not None:
+            self.fov = fov
+        if ipd is not None:
+            self.ipd = ipd
+        if width is not None or height is not None or fov is not None:
+            self._update_projection()
+            self.last_depth = None
     
     def render_stereo(self):
         """
@@ -69,6 +99,7 @@ class StereoCamera:
             cameraUpVector=up.tolist()
         )
         left_img = self._render_image(left_view_matrix)
+        left_depth = self._last_view_depth
 
         # 渲染右眼
         right_view_matrix = p.computeViewMatrix(
@@ -77,6 +108,10 @@ class StereoCamera:
             cameraUpVector=up.tolist()
         )
         right_img = self._render_image(right_view_matrix)
+        right_depth = self._last_view_depth
+
+        if self.capture_depth:
+            self.last_depth = np.hstack([left_depth, right_depth])
 
         return left_img, right_img
 
@@ -97,33 +132,72 @@ class StereoCamera:
 
         return sbs_img
     
-    def _render_image(self, view_matrix):
+    def render_view(self, eye_position, target_position, up_vector=(0, 0, 1), width=None, height=None):
+        """
+        从任意视点渲染单目图像（第三人称、监控等辅助相机使用）
+
+        Args:
+            eye_position: 相机位置 [x, y, z]
+            target_position: 观察目标 [x, y, z]
+            up_vector: 上方向
+            width: 图像宽度，默认与双目相机相同
+            height: 图像高度，默认与双目相机相同
+
+        Returns:
+            img: BGR 格式的图像 (numpy array)
+        """
+        width = width or self.width
+        height = height or self.height
+        view_matrix = p.computeViewMatrix(
+            cameraEyePosition=list(eye_position),
+            cameraTargetPosition=list(target_position),
+            cameraUpVector=list(up_vector)
+        )
+        if (width, height) == (self.width, self.height):
+            projection_matrix = self.projection_matrix
+        else:
+            projection_matrix = p.computeProjectionMatrixFOV(self.fov, width / height, 0.01, 100)
+        return self._render_image(view_matrix, width, height, projection_matrix)
+
+    def _render_image(self, view_matrix, width=None, height=None, projection_matrix=None):
         """
         渲染单个图像
 
         Args:
             view_matrix: 视图矩阵
+            width: 图像宽度，默认 self.width
+            height: 图像高度，默认 self.height
+            projection_matrix: 投影矩阵，默认 self.projection_matrix
 
         Returns:
             img: BGR 格式的图像 (numpy array)
         """
+        width = width or self.width
+        height = height or self.height
+
         # 使用 PyBullet 渲染
         _, _, rgb, depth, seg = p.getCameraImage(
-            width=self.width,
-            height=self.height,
+            width=width,
+            height=height,
             viewMatrix=view_matrix,
-            projectionMatrix=self.projection_matrix,
+            projectionMatrix=projection_matrix or self.projection_matrix,
             renderer=p.ER_BULLET_HARDWARE_OPENGL  # 硬件加速
         )
 
         # rgb 已经是 numpy array，形状为 (height, width, 4) 包含 RGBA
         # 需要重塑并去掉 alpha 通道
-        rgb_array = np.reshape(rgb, (self.height, self.width, 4))
+        rgb_array = np.reshape(rgb, (height, width, 4))
         rgb_array = rgb_array[:, :, :3].astype(np.uint8)  # 只取 RGB，去掉 A
 
         # 转换为 BGR（OpenCV 格式）
         bgr_array = cv2.cvtColor(rgb_array, cv2.COLOR_RGB2BGR)
 
+        # 深度缓冲（非线性 [0, 1]），仅在需要时保留
+        self._last_view_depth = (
+            np.reshape(depth, (height, width)).astype(np.float32)
+            if self.capture_depth else None
+        )
+
         return bgr_array
     
     def render_test_pattern(self):
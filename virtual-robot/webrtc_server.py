@@ -4,38 +4,57 @@ WebRTC 服务端模块
 """
 import asyncio
 import json
+import math
 import time
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCIceCandidate, VideoStreamTrack
+from aiortc.mediastreams import MediaStreamError, VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
 from av import VideoFrame
+import cv2
 import numpy as np
+from loop_watchdog import stage
+from render_scheduler import RenderScheduler
 
 
 class RobotVideoTrack(VideoStreamTrack):
     """
-    自定义视频轨道 - 从虚拟机器人获取帧
-    支持双轨道模式和 Side-by-Side 模式
+    自定义视频轨道 - 从渲染调度器获取操作员相机的帧
+    支持双轨道模式和 Side-by-Side 模式；同一帧由所有会话共享，只渲染一次
     """
 
-    def __init__(self, camera, mode='sbs', eye='left', fps=30, test_pattern=False):
+    def __init__(self, scheduler, mode='sbs', eye='left', camera_name='operator'):
         """
         Args:
-            camera: StereoCamera 实例
+            scheduler: RenderScheduler 实例
             mode: 'sbs' (Side-by-Side 单轨道) 或 'dual' (双轨道)
             eye: 'left' 或 'right' (仅在 dual 模式下使用)
-            fps: 目标帧率
-            test_pattern: 是否使用测试图案（调试用）
+            camera_name: 调度器中操作员相机的名称
         """
         super().__init__()
-        self.camera = camera
+        self.scheduler = scheduler
         self.mode = mode
         self.eye = eye
-        self.fps = fps
+        self.camera_name = camera_name
         self.counter = 0
-        self.test_pattern = test_pattern
+        self.last_seq = 0
+        self._start = None
+        self._last_pts = -1
 
-        # 用于帧率控制
-        self.frame_interval = 1.0 / fps
-        self.last_frame_time = 0
+    def _timestamp(self):
+        """
+        按实际经过时间生成时间戳
+
+        VideoStreamTrack.next_timestamp 固定按 30fps 递增并在内部 sleep，
+        帧率由调度器控制时会限制在 30fps 并使时间戳与真实帧间隔不符
+
+        Returns:
+            (pts, time_base)
+        """
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        pts = max(int((now - self._start) * VIDEO_CLOCK_RATE), self._last_pts + 1)
+        self._last_pts = pts
+        return pts, VIDEO_TIME_BASE
 
     async def recv(self):
         """
@@ -44,50 +63,42 @@ class RobotVideoTrack(VideoStreamTrack):
         Returns:
             VideoFrame: 视频帧
         """
-        # 生成时间戳
-        pts, time_base = await self.next_timestamp()
+        if self.readyState != 'live':
+            raise MediaStreamError
 
-        # 帧率控制
-        current_time = time.time()
-        if current_time - self.last_frame_time < self.frame_interval:
-            await asyncio.sleep(self.frame_interval - (current_time - self.last_frame_time))
-        self.last_frame_time = time.time()
+        # 等待调度器渲染出新帧（帧率由调度器控制）
+        self.last_seq, rendered = await self.scheduler.wait_frame(self.camera_name, self.last_seq)
 
-        try:
-            # 从虚拟相机获取帧
-            if self.mode == 'sbs':
-                # Side-by-Side 模式：发送拼接后的图像
-                if self.test_pattern:
-                    img = self.camera.render_test_pattern_sbs()
-                else:
-                    img = self.camera.render_stereo_sbs()
-            else:
-                # 双轨道模式：发送单眼图像
-                if self.test_pattern:
-                    left_img, right_img = self.camera.render_test_pattern()
-                else:
-                    left_img, right_img = self.camera.render_stereo()
-
-                # 选择左眼或右眼
-                img = left_img if self.eye == 'left' else right_img
-
-            # 转换为 VideoFrame
-            frame = VideoFrame.from_ndarray(img, format='bgr24')
-            frame.pts = pts
-            frame.time_base = time_base
-            self.counter += 1
-            return frame
+        # 生成时间戳
+        pts, time_base = self._timestamp()
 
-        except Exception as e:
+        if rendered is None:
             # 返回黑色帧作为备用
+            width, height = self.scheduler.jobs[self.camera_name].resolution
             if self.mode == 'sbs':
-                black_frame = np.zeros((480, 1280, 3), dtype=np.uint8)
+                width *= 2
+            img = np.zeros((height, width, 3), dtype=np.uint8)
+        elif isinstance(rendered, tuple):
+            # 双眼分开渲染（dual 模式）
+            left_img, right_img = rendered
+            if self.mode == 'sbs':
+                # 运行时切换了视频模式，本会话重新协商前仍按 sbs 发送
+                img = np.hstack([left_img, right_img])
             else:
-                black_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            frame = VideoFrame.from_ndarray(black_frame, format='bgr24')
-            frame.pts = pts
-            frame.time_base = time_base
-            return frame
+                img = left_img if self.eye == 'left' else right_img
+        elif self.mode == 'sbs':
+            img = rendered
+        else:
+            # 运行时切换到了 sbs，本会话重新协商前从拼接图中取单眼
+            half = rendered.shape[1] // 2
+            img = np.ascontiguousarray(rendered[:, :half] if self.eye == 'left' else rendered[:, half:])
+
+        # 转换为 VideoFrame
+        frame = VideoFrame.from_ndarray(img, format='bgr24')
+        frame.pts = pts
+        frame.time_base = time_base
+        self.counter += 1
+        return frame
 
 
 class WebRTCServer:
@@ -96,7 +107,8 @@ class WebRTCServer:
     处理与 VR 客户端的连接
     """
 
-    def __init__(self, robot_sim, camera, fps=30, test_pattern=False, video_mode='sbs'):
+    def __init__(self, robot_sim, camera, fps=30, test_pattern=False, video_mode='sbs', publisher=None,
+                 scheduler=None):
         """
         Args:
             robot_sim: VirtualRobot 实例
@@ -104,98 +116,257 @@ class WebRTCServer:
             fps: 视频帧率
             test_pattern: 是否使用测试图案（调试用）
             video_mode: 'sbs' (Side-by-Side 单轨道) 或 'dual' (双轨道)
+            publisher: FramePublisher 实例（可选），供进程外读取帧和状态
+            scheduler: RenderScheduler 实例（可选），用于与辅助相机共享渲染时间
         """
         self.robot_sim = robot_sim
         self.camera = camera
         self.fps = fps
         self.test_pattern = test_pattern
         self.video_mode = video_mode
-        self.pc = None
+        self.publisher = publisher
         self.data_channel = None
+        self.peer_connections = set()
+        self.sessions = {}  # 信令会话（WebSocket 连接）-> RTCPeerConnection
+
+        # 操作员双目相机注册为最高优先级任务，有客户端拉流时按 fps 渲染
+        self.scheduler = scheduler or RenderScheduler()
+        self.scheduler.register(
+            'operator',
+            self._render_operator,
+            rate=fps,
+            resolution=(camera.width, camera.height),
+            operator=True
+        )
+
+    def _render_operator(self, width, height):
+        """
+        渲染操作员双目画面，并发布到共享内存
+
+        Returns:
+            sbs 模式返回拼接后的图像，dual 模式返回 (left_img, right_img)
+        """
+        if self.video_mode == 'sbs':
+            if self.test_pattern:
+                img = self.camera.render_test_pattern_sbs()
+            else:
+                img = self.camera.render_stereo_sbs()
+            if self.publisher:
+                self._publish(img)
+            return img
+
+        if self.test_pattern:
+            left_img, right_img = self.camera.render_test_pattern()
+        else:
+            left_img, right_img = self.camera.render_stereo()
+        if self.publisher:
+            self._publish(np.hstack([left_img, right_img]))
+        return left_img, right_img
+
+    def get_config(self):
+        """
+        获取当前管线参数
+
+        Returns:
+            dict: {'fps', 'width', 'height', 'video_mode', 'ipd', 'fov'}
+        """
+        return {
+            'fps': self.fps,
+            'width': self.camera.width,
+            'height': self.camera.height,
+            'video_mode': self.video_mode,
+            'ipd': self.camera.ipd,
+            'fov': self.camera.fov,
+        }
+
+    def configure(self, fps=None, width=None, height=None, video_mode=None, ipd=None, fov=None):
+        """
+        运行时修改管线参数，无需重启服务器
+
+        - fps：修改调度器中操作员相机的帧率
+        - width / height / fov：重建投影矩阵，重建共享内存帧缓冲；编码器在收到新尺寸的帧时自动重建
+        - ipd：下一帧生效
+        - video_mode：轨道数量变化，只对之后建立的会话生效；现有会话需重新发送 offer
+
+        Args:
+            fps: 视频帧率
+            width: 单眼图像宽度
+            height: 图像高度
+            video_mode: 'sbs' 或 'dual'
+            ipd: 瞳距（米）
+            fov: 视场角（度）
+
+        Returns:
+            dict: {'config': 当前参数, 'renegotiate': 现有会话是否需要重新协商}
+
+        Raises:
+            ValueError: 参数无效
+        """
+        # JSON 允许 NaN / Infinity，先确认是有限数值再比较范围和取整
+        for name, value in (('fps', fps), ('width', width), ('height', height), ('ipd', ipd), ('fov', fov)):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))
+                                      or not math.isfinite(value)):
+                raise ValueError(f"{name} must be a finite number, got {value!r}")
+
+        if fps is not None and not 0 < fps <= 120:
+            raise ValueError(f"fps must be in (0, 120], got {fps}")
+        for name, value in (('width', width), ('height', height)):
+            if value is not None and (int(value) != value or not 16 <= value <= 4096):
+                raise ValueError(f"{name} must be an integer in [16, 4096], got {value}")
+        if video_mode is not None and video_mode not in ('sbs', 'dual'):
+            raise ValueError(f"video_mode must be 'sbs' or 'dual', got {video_mode!r}")
+        if ipd is not None and not 0 <= ipd <= 0.2:
+            raise ValueError(f"ipd must be in [0, 0.2] meters, got {ipd}")
+        if fov is not None and not 10 <= fov <= 170:
+            raise ValueError(f"fov must be in [10, 170] degrees, got {fov}")
+
+        if fps is not None:
+            self.fps = fps
+            self.scheduler.configure('operator', rate=fps)
+
+        width = int(width) if width is not None else None
+        height = int(height) if height is not None else None
+        self.camera.configure(width=width, height=height, fov=fov, ipd=ipd)
+        if width is not None or height is not None:
+            self.scheduler.configure('operator', resolution=(self.camera.width, self.camera.height))
+            if self.publisher:
+                self.publisher.resize(self.camera.width * 2, self.camera.height)
+
+        renegotiate = False
+        if video_mode is not None and video_mode != self.video_mode:
+            self.video_mode = video_mode
+            renegotiate = bool(self.peer_connections)
+
+        return {'config': self.get_config(), 'renegotiate': renegotiate}
+
+    async def get_camera_frame(self, name, quality=80, timeout=1.0):
+        """
+        获取辅助相机（如第三人称监控相机）的最新一帧，JPEG 编码
+
+        按需渲染的相机在无人请求时暂停，暂停后的第一次请求会等待新渲染的一帧
+
+        Args:
+            name: 调度器中的相机名称（不能是操作员相机）
+            quality: JPEG 质量 [1, 100]
+            timeout: 等待新帧的最长时间（秒）
+
+        Returns:
+            (seq, jpeg_bytes)
+
+        Raises:
+            KeyError: 没有该名称的辅助相机
+            asyncio.TimeoutError: 超时仍未渲染出帧
+            RuntimeError: 渲染失败
+        """
+        job = self.scheduler.jobs.get(name)
+        if job is None or job.operator:
+            raise KeyError(name)
+
+        paused = job.on_demand and time.perf_counter() - job.last_request >= self.scheduler.idle_timeout
+        seq, frame = self.scheduler.latest(name)
+        if frame is None or paused:
+            seq, frame = await asyncio.wait_for(self.scheduler.wait_frame(name, seq), timeout)
+        if frame is None:
+            raise RuntimeError(f"camera '{name}' failed to render")
+
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ok:
+            raise RuntimeError(f"camera '{name}' frame could not be encoded")
+        return seq, jpeg.tobytes()
+
+    def _publish(self, sbs_img):
+        """将 SBS 图像和机器人状态写入共享内存"""
+        position, orientation = self.robot_sim.get_head_pose()
+        self.publisher.publish(
+            sbs_img,
+            position,
+            orientation,
+            joint_positions=self.robot_sim.get_joint_positions(),
+            depth=self.camera.last_depth
+        )
     
-    async def handle_offer(self, offer_sdp):
+    async def handle_offer(self, offer_sdp, session=None):
         """
         处理来自 VR 客户端的 Offer
 
         Args:
             offer_sdp: SDP Offer 字典 {'sdp': str, 'type': str}
+            session: 信令会话标识（如 WebSocket 连接），该会话后续的 ICE Candidate 交给这个连接
 
         Returns:
             answer_sdp: SDP Answer 字典 {'sdp': str, 'type': str}
         """
+        # 同一会话重新发送 offer（如重新协商）时，旧连接已被取代
+        previous = self.sessions.pop(session, None)
+        if previous:
+            await previous.close()
+            self.peer_connections.discard(previous)
+
         # 创建 RTCPeerConnection
-        self.pc = RTCPeerConnection()
+        pc = RTCPeerConnection()
+        self.sessions[session] = pc
+        self.peer_connections.add(pc)
 
         # 添加视频轨道
         if self.video_mode == 'sbs':
             # Side-by-Side 模式：只添加一个轨道
-            sbs_track = RobotVideoTrack(
-                self.camera,
-                mode='sbs',
-                fps=self.fps,
-                test_pattern=self.test_pattern
-            )
-            self.pc.addTrack(sbs_track)
+            sbs_track = RobotVideoTrack(self.scheduler, mode='sbs')
+            pc.addTrack(sbs_track)
         else:
             # 双轨道模式：添加左右眼两个轨道
-            left_track = RobotVideoTrack(
-                self.camera,
-                mode='dual',
-                eye='left',
-                fps=self.fps,
-                test_pattern=self.test_pattern
-            )
-            right_track = RobotVideoTrack(
-                self.camera,
-                mode='dual',
-                eye='right',
-                fps=self.fps,
-                test_pattern=self.test_pattern
-            )
-            self.pc.addTrack(left_track)
-            self.pc.addTrack(right_track)
+            left_track = RobotVideoTrack(self.scheduler, mode='dual', eye='left')
+            right_track = RobotVideoTrack(self.scheduler, mode='dual', eye='right')
+            pc.addTrack(left_track)
+            pc.addTrack(right_track)
         
         # 处理 DataChannel（接收控制数据）
-        @self.pc.on("datachannel")
+        @pc.on("datachannel")
         def on_datachannel(channel):
             self.data_channel = channel
 
             @channel.on("message")
             def on_message(message):
                 try:
-                    control_data = json.loads(message)
-                    self.robot_sim.apply_vr_control(control_data)
+                    with stage('control'):
+                        control_data = json.loads(message)
+                        self.robot_sim.apply_vr_control(control_data)
                 except:
                     pass
 
         # 监听连接状态
-        @self.pc.on("connectionstatechange")
+        @pc.on("connectionstatechange")
         async def on_connectionstatechange():
-            if self.pc.connectionState == "failed":
-                await self.pc.close()
+            if pc.connectionState == "failed":
+                await pc.close()
+            if pc.connectionState in ("failed", "closed"):
+                self.peer_connections.discard(pc)
+                if self.sessions.get(session) is pc:
+                    del self.sessions[session]
         
         # 设置远程描述
-        await self.pc.setRemoteDescription(
+        await pc.setRemoteDescription(
             RTCSessionDescription(sdp=offer_sdp['sdp'], type=offer_sdp['type'])
         )
 
         # 创建 Answer
-        answer = await self.pc.createAnswer()
-        await self.pc.setLocalDescription(answer)
+        answer = await pc.createAnswer()
+        await pc.setLocalDescription(answer)
 
         return {
-            'sdp': self.pc.localDescription.sdp,
-            'type': self.pc.localDescription.type
+            'sdp': pc.localDescription.sdp,
+            'type': pc.localDescription.type
         }
     
-    async def add_ice_candidate(self, candidate_dict):
+    async def add_ice_candidate(self, candidate_dict, session=None):
         """
         添加 ICE Candidate
 
         Args:
             candidate_dict: ICE Candidate 字典（来自浏览器）
+            session: 发送该 Candidate 的信令会话，与 handle_offer 的 session 对应
         """
-        if self.pc:
+        pc = self.sessions.get(session)
+        if pc:
             try:
                 if isinstance(candidate_dict, dict):
                     candidate = RTCIceCandidate(
@@ -211,12 +382,24 @@ class WebRTCServer:
                     )
                 else:
                     candidate = candidate_dict
-                await self.pc.addIceCandidate(candidate)
+                await pc.addIceCandidate(candidate)
             except:
                 pass
 
+    def end_session(self, session):
+        """
+        信令会话断开时解除与对等连接的关联（媒体连接本身不受影响）
+
+        Args:
+            session: 信令会话标识
+        """
+        self.sessions.pop(session, None)
+
     async def close(self):
-        """关闭连接"""
-        if self.pc:
-            await self.pc.close()
+        """关闭所有连接"""
+        for pc in list(self.peer_connections):
+            await pc.close()
+        self.peer_connections.clear()
+        self.sessions.clear()
+        await self.scheduler.stop()
 